@@ -36,14 +36,6 @@ unzip -o ogvjs-1.6.1.zip
 mv ogvjs-1.6.1 $ASSETS_PATH/ogvjs
 rm -f ogvjs-1.6.1.zip
 
-echo "getting chosen.jquery.js"
-curl -L -O https://github.com/harvesthq/chosen/releases/download/v1.8.7/chosen_v1.8.7.zip
-rm -rf $ASSETS_PATH/chosen
-mkdir -p $ASSETS_PATH/chosen
-unzip -o -d $ASSETS_PATH/chosen chosen_v1.8.7.zip
-rm -rf $ASSETS_PATH/chosen/docsupport $ASSETS_PATH/chosen/chosen.proto.* $ASSETS_PATH/chosen/*.html $ASSETS_PATH/chosen/*.md
-rm -f chosen_v1.8.7.zip
-
 echo "getting videojs-ogvjs.js"
 curl -L -O https://github.com/hartman/videojs-ogvjs/archive/v1.3.1.zip
 rm -f $ASSETS_PATH/videojs-ogvjs.js
@@ -52,9 +44,6 @@ mv videojs-ogvjs-1.3.1/dist/videojs-ogvjs.js $ASSETS_PATH/videojs-ogvjs.js
 rm -rf videojs-ogvjs-1.3.1
 rm -f v1.3.1.zip
 
-echo "getting jquery.js"
-curl -L -o $ASSETS_PATH/jquery.min.js https://code.jquery.com/jquery-1.12.4.min.js
-
 echo "getting webp-hero"
 curl -L -O https://unpkg.com/webp-hero@0.0.0-dev.26/dist-cjs/polyfills.js
 rm -f $ASSETS_PATH/polyfills.js
@@ -30,7 +30,7 @@ setup(
     url="https://github.com/openzim/youtube",
     keywords="kiwix zim youtube offline",
     license="GPLv3+",
-    packages=["youtube2zim"],
+    packages=["youtube2zim", "youtube2zim.playlists", "youtube2zim.daemon"],
     install_requires=[
         line.strip()
         for line in read("requirements.txt").splitlines()
@@ -42,6 +42,7 @@ setup(
         "console_scripts": [
             "youtube2zim=youtube2zim.__main__:main",
             "youtube2zim-playlists=youtube2zim.playlists.__main__:main",
+            "youtube2zim-daemon=youtube2zim.daemon.__main__:main",
         ]
     },
     classifiers=[
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: ai ts=4 sts=4 et sw=4 nu
+
+import os
+import fcntl
+import shutil
+import tempfile
+import contextlib
+from pathlib import Path
+
+from .constants import logger
+from .utils import link_or_copy
+
+
+class LocalCache(object):
+    """on-disk cache of optimized files, shared by builds on the same host
+
+    Entries are stored at <root>/<key>/v<version> (keys as in S3 cache).
+    They are copied in but hardlinked out to build folders when on the same
+    filesystem: entries are immutable and files retrieved with get() must be
+    replaced (unlinked first), never written into.
+    Writes are atomic (rename) and eviction (least recently used first,
+    based on mtime) is serialized across processes with a lock file."""
+
+    def __init__(self, root, max_size=None):
+        self.root = Path(root).expanduser().resolve()
+        self.max_size = max_size
+        self.tmp_dir = self.root.joinpath(".tmp")
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.lock_path = self.root.joinpath(".lock")
+
+    def get_entry_path(self, key, version):
+        return self.root.joinpath(key, f"v{version}")
+
+    def find_entry(self, key, version=None):
+        """ path of entry for key at version (any version if None) or None """
+        if version is not None:
+            path = self.get_entry_path(key, version)
+            return path if path.exists() else None
+        entries = sorted(
+            self.root.joinpath(key).glob("v*"),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+        return entries[0] if entries else None
+
+    def get(self, key, dst, version=None):
+        """whether an entry for key was linked to dst
+
+        dst shares the entry's data: it must not be modified in place"""
+        entry = self.find_entry(key, version)
+        if not entry:
+            return False
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if dst.exists():
+                dst.unlink()
+            link_or_copy(entry, dst)
+            # record usage for LRU eviction
+            os.utime(entry)
+        except OSError as exc:
+            # entry could have been evicted concurrently
+            logger.debug(f"{key} failed to retrieve from local cache: {exc}")
+            return False
+        return True
+
+    def put(self, key, src, version):
+        """whether src was stored in cache for key at version
+
+        src is copied so later changes to it don't alter the entry"""
+        entry = self.get_entry_path(key, version)
+        tmp_path = None
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+            os.close(fd)
+            shutil.copy2(src, tmp_path)
+            os.replace(tmp_path, entry)
+        except OSError as exc:
+            logger.error(f"{key} failed to store in local cache: {exc}")
+            if tmp_path:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_path)
+            return False
+        return True
+
+    @contextlib.contextmanager
+    def locked(self):
+        with open(self.lock_path, "w") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def evict(self):
+        """ remove least recently used entries until cache fits max_size """
+        if self.max_size is None:
+            return
+        with self.locked():
+            entries = []
+            for path in self.root.rglob("v*"):
+                if not path.is_file() or self.tmp_dir in path.parents:
+                    continue
+                with contextlib.suppress(OSError):
+                    stat = path.stat()
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_size:
+                return
+            logger.info(
+                f"evicting from local cache ({total} bytes over {self.max_size})"
+            )
+            for _, size, path in sorted(entries):
+                if total <= self.max_size:
+                    break
+                with contextlib.suppress(OSError):
+                    path.unlink()
+                    total -= size
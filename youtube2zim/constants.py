@@ -4,6 +4,9 @@
 
 import pathlib
 import logging
+import threading
+
+import requests
 
 from zimscraperlib.logging import getLogger
 
@@ -19,6 +22,22 @@ CHANNEL = "channel"
 PLAYLIST = "playlist"
 USER = "user"
 
+# API thumbnails by preference. high and standard are 4:3 letterboxed
+# and get cropped to 16:9 on resize
+THUMBNAILS_QUALITIES = ("maxres", "standard", "high", "medium", "default")
+
+# version of subtitles in optimization cache. bump to invalidate cached tracks
+SUBTITLES_CACHE_VERSION = 1
+# cached subtitles indexes are dated with this (strftime) so tracks added to
+# videos are picked up once it changes
+SUBTITLES_INDEX_PERIOD = "%Y-%m"
+
+# descriptions are truncated to this in videos listings (data.js)
+LISTING_DESCRIPTION_LENGTH = 200
+
+# number of videos per data file (assets/data/videos_<n>.js)
+DATA_BLOCK_SIZE = 500
+
 # Youtube uses some non-standard language codes
 YOUTUBE_LANG_MAP = {"iw": "he", "es-419": "es"}
 
@@ -30,10 +49,34 @@ class Youtube(object):
         self.build_dir = None
         self.cache_dir = None
         self.api_key = None
+        # kept for the process lifetime (can run several scrapers)
+        self.session = requests.Session()
+        self.session_pool_maxsize = 0  # resized per scrapers' concurrency
+        self.valid_api_keys = set()
+        # {folder: (signature, {key: result})} of API caches read by process
+        self.api_caches = {}
+        self.quota_used = 0  # API quota units consumed by this process
+        self.quota_lock = threading.Lock()
 
     def update(self, **kwargs):
         for key, value in kwargs.items():
             setattr(self, key, value)
 
+    def resize_session(self, pool_maxsize):
+        """ keep up to pool_maxsize connections per host (never shrinks) """
+        pool_maxsize = max(pool_maxsize, 10)
+        if pool_maxsize <= self.session_pool_maxsize:
+            return
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=4, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session_pool_maxsize = pool_maxsize
+
+    def add_quota(self, units):
+        with self.quota_lock:
+            self.quota_used += units
+
 
 YOUTUBE = Youtube()
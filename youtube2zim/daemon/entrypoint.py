@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: ai ts=4 sts=4 et sw=4 nu
+
+import logging
+import argparse
+
+from ..constants import NAME, SCRAPER, logger
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog=f"{NAME}-daemon",
+        description="Service running youtube2zim jobs submitted over HTTP",
+        epilog="Jobs are submitted with POST /jobs and a JSON body of "
+        '{"args": [<youtube2zim arguments>]}. See README for other endpoints.',
+    )
+
+    parser.add_argument(
+        "--host",
+        help="Address to listen on. Defaults to 127.0.0.1",
+        default="127.0.0.1",
+    )
+    parser.add_argument(
+        "--port", help="Port to listen on. Defaults to 8000", type=int, default=8000
+    )
+    parser.add_argument(
+        "--jobs-dir",
+        help="Folder to persist jobs (status, logs) into. Unfinished jobs "
+        "found there on start are queued again",
+        required=True,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of jobs to run in parallel. Defaults to 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--api-key", help="Youtube API Token for jobs not specifying one"
+    )
+    parser.add_argument(
+        "--local-cache",
+        help="Local optimization cache for jobs not specifying one. "
+        "Shared by all jobs",
+    )
+    parser.add_argument(
+        "--debug", help="Enable verbose output", action="store_true", default=False
+    )
+    parser.add_argument(
+        "--version",
+        help="Display scraper version and exit",
+        action="version",
+        version=SCRAPER,
+    )
+
+    args = parser.parse_args()
+    logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
+
+    if args.workers < 1:
+        parser.error(f"Invalid --workers: {args.workers}")
+
+    from .server import Daemon
+
+    try:
+        daemon = Daemon(
+            jobs_dir=args.jobs_dir,
+            workers=args.workers,
+            api_key=args.api_key,
+            local_cache=args.local_cache,
+        )
+        daemon.serve(args.host, args.port)
+    except KeyboardInterrupt:
+        logger.info("stopping")
+    except Exception as exc:
+        logger.error(f"FAILED. An error occurred: {exc}")
+        if args.debug:
+            logger.exception(exc)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
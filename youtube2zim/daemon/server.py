@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: ai ts=4 sts=4 et sw=4 nu
+
+"""
+    youtube2zim as a service
+
+    Jobs (youtube2zim arguments) are submitted over HTTP, persisted as JSON
+    files in jobs dir and run by a pool of long-lived worker processes which
+    keep imports, Youtube API session and validated credentials across jobs.
+
+    GET  /jobs              list of jobs
+    POST /jobs              submit a job: {"args": [...]}
+    GET  /jobs/<id>         job details (status, metrics)
+    GET  /jobs/<id>/log     job output
+    GET  /metrics           jobs count per status, API quota usage
+"""
+
+import os
+import json
+import uuid
+import logging
+import datetime
+import threading
+import functools
+import http.server
+import socketserver
+import multiprocessing
+import concurrent.futures
+from pathlib import Path
+
+from dateutil import parser as dt_parser
+
+from ..constants import logger, YOUTUBE
+from ..entrypoint import get_parser, check_args, run
+from ..utils import get_argument_value, load_json
+
+STATUSES = ("queued", "running", "succeeded", "failed")
+
+
+def now():
+    return datetime.datetime.utcnow().isoformat(timespec="seconds")
+
+
+def save_job(jobs_dir, job):
+    """ atomically write job's JSON (read by other processes) """
+    tmp_path = jobs_dir.joinpath(f".{job['id']}.json")
+    with open(tmp_path, "w") as fh:
+        json.dump(job, fh, indent=4)
+    os.replace(tmp_path, jobs_dir.joinpath(f"{job['id']}.json"))
+
+
+def warm_up():
+    """ worker process initializer: load youtube_dl's extractors once """
+    from youtube_dl.extractor import gen_extractor_classes
+
+    gen_extractor_classes()
+
+
+def run_job(jobs_dir, job_id):
+    """ run a job in a worker process. returns job's result """
+
+    jobs_dir = Path(jobs_dir)
+    job = load_json(jobs_dir, job_id)
+    job.update({"status": "running", "started_on": now()})
+    save_job(jobs_dir, job)
+
+    handler = logging.FileHandler(jobs_dir.joinpath(f"{job_id}.log"))
+    handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s:%(message)s"))
+    logger.addHandler(handler)
+    quota_before = YOUTUBE.quota_used
+    try:
+        args = get_parser().parse_args(job["args"])
+        logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
+        run(args)
+    except (Exception, SystemExit) as exc:
+        logger.error(f"FAILED. An error occurred: {exc}")
+        logger.exception(exc)
+        result = {"status": "failed", "error": str(exc)}
+    else:
+        result = {"status": "succeeded", "error": None}
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    result["quota_used"] = YOUTUBE.quota_used - quota_before
+    return result
+
+
+class Daemon(object):
+    def __init__(self, jobs_dir, workers, api_key=None, local_cache=None):
+        self.jobs_dir = Path(jobs_dir).expanduser().resolve()
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.api_key = api_key
+        self.local_cache = local_cache
+        self.started_on = now()
+        self.lock = threading.Lock()
+
+        # spawn: forking a process with HTTP threads running is unsafe
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm_up,
+        )
+
+    def get_job(self, job_id):
+        return load_json(self.jobs_dir, job_id)
+
+    def get_jobs(self):
+        jobs = [
+            load_json(path.parent, path.stem)
+            for path in self.jobs_dir.glob("*.json")
+            if not path.name.startswith(".")
+        ]
+        return sorted(filter(None, jobs), key=lambda job: job["created_on"])
+
+    def get_job_args(self, args):
+        """ job's youtube2zim args with daemon's defaults. raises on invalid """
+        if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+            raise ValueError("args must be a list of strings")
+        args = list(args)
+        if self.api_key and get_argument_value("api-key", args) is None:
+            args += ["--api-key", self.api_key]
+        if self.local_cache and get_argument_value("local-cache", args) is None:
+            args += ["--local-cache", self.local_cache]
+        try:
+            parsed_args = get_parser().parse_args(args)
+        except SystemExit:
+            raise ValueError("invalid youtube2zim arguments")
+        check_args(parsed_args)
+        return args
+
+    def submit(self, args):
+        job = {
+            "id": uuid.uuid4().hex,
+            "args": self.get_job_args(args),
+            "status": "queued",
+            "created_on": now(),
+            "started_on": None,
+            "ended_on": None,
+            "error": None,
+            "quota_used": None,
+        }
+        with self.lock:
+            save_job(self.jobs_dir, job)
+        self.enqueue(job)
+        return job
+
+    def enqueue(self, job):
+        logger.info(f"queuing job {job['id']}")
+        future = self.executor.submit(run_job, str(self.jobs_dir), job["id"])
+        future.add_done_callback(functools.partial(self.on_done, job["id"]))
+
+    def on_done(self, job_id, future):
+        try:
+            result = future.result()
+        except Exception as exc:  # worker process died
+            result = {"status": "failed", "error": repr(exc), "quota_used": None}
+        with self.lock:
+            job = self.get_job(job_id)
+            job.update(result)
+            job["ended_on"] = now()
+            save_job(self.jobs_dir, job)
+        logger.info(f"job {job_id} {job['status']}")
+
+    def resume_jobs(self):
+        """ queue again jobs which were not over when daemon stopped """
+        for job in self.get_jobs():
+            if job["status"] in ("queued", "running"):
+                job.update({"status": "queued", "started_on": None})
+                save_job(self.jobs_dir, job)
+                self.enqueue(job)
+
+    def get_metrics(self):
+        jobs = self.get_jobs()
+        quota_per_day = {}
+        durations = []
+        for job in jobs:
+            if job["ended_on"] and job["quota_used"] is not None:
+                day = job["ended_on"][:10]
+                quota_per_day[day] = quota_per_day.get(day, 0) + job["quota_used"]
+            if job["ended_on"] and job["started_on"]:
+                durations.append(
+                    (
+                        dt_parser.parse(job["ended_on"])
+                        - dt_parser.parse(job["started_on"])
+                    ).total_seconds()
+                )
+        return {
+            "started_on": self.started_on,
+            "workers": self.workers,
+            "jobs": {
+                status: len([job for job in jobs if job["status"] == status])
+                for status in STATUSES
+            },
+            "quota_used_per_day": quota_per_day,
+            "average_duration": sum(durations) / len(durations) if durations else None,
+        }
+
+    def serve(self, host, port):
+        self.resume_jobs()
+        server = ThreadingHTTPServer((host, port), RequestHandler)
+        server.daemon = self
+        logger.info(f"listening on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            self.executor.shutdown(wait=False)
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    @property
+    def daemon(self):
+        return self.server.daemon
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload, indent=4).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_json({"error": message}, status=status)
+
+    def do_GET(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if parts == ["metrics"]:
+            return self.send_json(self.daemon.get_metrics())
+        if parts == ["jobs"]:
+            return self.send_json(self.daemon.get_jobs())
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.daemon.get_job(parts[1])
+            if not job:
+                return self.send_error_json(404, "job not found")
+            if len(parts) == 2:
+                return self.send_json(job)
+            if parts[2] == "log":
+                log_path = self.daemon.jobs_dir.joinpath(f"{job['id']}.log")
+                body = log_path.read_bytes() if log_path.exists() else b""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+        self.send_error_json(404, "not found")
+
+    def do_POST(self):
+        if self.path.split("?")[0].strip("/") != "jobs":
+            return self.send_error_json(404, "not found")
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            job = self.daemon.submit(payload.get("args"))
+        except (ValueError, AttributeError) as exc:
+            return self.send_error_json(400, str(exc))
+        self.send_json(job, status=201)
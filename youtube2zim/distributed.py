@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: ai ts=4 sts=4 et sw=4 nu
+
+"""
+    Distributed build over a directory shared by all participants
+
+    - coordinator: API phase, splits videos into work units
+    - worker (any number, any host): claims units, downloads and encodes
+      their videos then publishes media to the work dir
+    - merge: once all units are done, builds HTML files and ZIM(s)
+
+    Units are claimed by renaming them (atomic) so no other lock is needed.
+    Running coordinator again on an existing work dir requeues claimed units
+    (of crashed workers)
+"""
+
+import os
+import shutil
+import socket
+from pathlib import Path
+
+from .constants import logger
+from .utils import link_or_copy, save_json, load_json
+
+ROLES = ("coordinator", "worker", "merge")
+
+
+class WorkDir(object):
+    """layout of the shared directory
+
+    cache/                  Youtube API results (seeds --api-cache)
+    units/todo/<unit>.json  videos IDs to process
+    units/claimed/<unit>    units being processed by a worker
+    units/done/<unit>.json  {succeeded: [], failed: []} for processed units
+    videos/<videoId>/       media of succeeded videos
+    renditions/<name>/<videoId>/  their extra renditions (--extra-renditions)"""
+
+    def __init__(self, path):
+        self.path = Path(path).expanduser().resolve()
+
+    @property
+    def cache_dir(self):
+        return self.path.joinpath("cache")
+
+    @property
+    def videos_dir(self):
+        return self.path.joinpath("videos")
+
+    def renditions_dir(self, name):
+        return self.path.joinpath("renditions", name)
+
+    def units_dir(self, state):
+        return self.path.joinpath("units", state)
+
+    def setup(self):
+        for folder in (self.cache_dir, self.videos_dir):
+            folder.mkdir(parents=True, exist_ok=True)
+        for state in ("todo", "claimed", "done"):
+            self.units_dir(state).mkdir(parents=True, exist_ok=True)
+
+    def has_units(self):
+        return any(
+            self.units_dir(state).exists() and any(self.units_dir(state).iterdir())
+            for state in ("todo", "claimed", "done")
+        )
+
+    def pending_units(self):
+        return [
+            path.name
+            for state in ("todo", "claimed")
+            for path in self.units_dir(state).iterdir()
+        ]
+
+    def add_unit(self, name, videos_ids):
+        # written aside then moved so workers never see a partial unit
+        save_json(self.path, name, videos_ids)
+        os.replace(
+            self.path.joinpath(f"{name}.json"),
+            self.units_dir("todo").joinpath(f"{name}.json"),
+        )
+
+    def claim_unit(self):
+        """ (name, videos_ids) of a unit now exclusively ours or None """
+        for path in sorted(self.units_dir("todo").iterdir()):
+            claimed = self.units_dir("claimed").joinpath(path.name)
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:  # claimed by another worker
+                continue
+            return path.stem, load_json(claimed.parent, path.stem)
+        return None
+
+    def requeue_claimed_units(self):
+        claimed = list(self.units_dir("claimed").iterdir())
+        for path in claimed:
+            os.rename(path, self.units_dir("todo").joinpath(path.name))
+        return len(claimed)
+
+    def complete_unit(self, name, succeeded, failed):
+        save_json(
+            self.units_dir("done"), name, {"succeeded": succeeded, "failed": failed}
+        )
+        self.units_dir("claimed").joinpath(f"{name}.json").unlink()
+
+    def results(self):
+        """ overall succeeded, failed videos IDs of done units """
+        succeeded, failed = [], []
+        for path in sorted(self.units_dir("done").iterdir()):
+            result = load_json(path.parent, path.stem)
+            succeeded += result["succeeded"]
+            failed += result["failed"]
+        return succeeded, failed
+
+    def publish_video(self, video_dir, videos_dir=None):
+        """ move a video's media folder to the shared videos (or videos_dir) """
+        dst = (videos_dir or self.videos_dir).joinpath(video_dir.name)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        if dst.exists():  # from a previous attempt of this unit
+            shutil.rmtree(dst)
+        shutil.move(str(video_dir), str(dst))
+
+
+def run_coordinator(scraper, work_dir, unit_size):
+    """ retrieve collection and split its videos into units of unit_size """
+
+    work_dir.setup()
+    if work_dir.has_units():
+        nb_requeued = work_dir.requeue_claimed_units()
+        logger.info(f"work dir already has units. requeued {nb_requeued} claimed")
+        return
+
+    scraper.prepare()
+    scraper.retrieve_collection()
+
+    logger.info(f"sharing Youtube API results via {work_dir.cache_dir}")
+    for path in scraper.cache_dir.glob("*.json"):
+        shutil.copy2(path, work_dir.cache_dir)
+
+    # media carried over from previous ZIM are published as a done unit
+    if scraper.reused_videos:
+        reused = sorted(scraper.reused_videos)
+        for video_id in reused:
+            work_dir.publish_video(scraper.videos_dir.joinpath(video_id))
+        save_json(
+            work_dir.units_dir("done"),
+            "unit_reused",
+            {"succeeded": reused, "failed": []},
+        )
+
+    videos_ids = [
+        video_id
+        for video_id in scraper.videos_ids
+        if video_id not in scraper.reused_videos
+    ]
+    nb_units = 0
+    for index in range(0, len(videos_ids), unit_size):
+        work_dir.add_unit(
+            f"unit_{index // unit_size:05d}", videos_ids[index : index + unit_size]
+        )
+        nb_units += 1
+    logger.info(f".. {nb_units} units of up to {unit_size} videos")
+    scraper.cleanup()
+
+
+def run_worker(scraper, work_dir):
+    """ process units until there's none left to claim """
+
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    scraper.api_cache = work_dir.cache_dir
+    scraper.previous_zim = None  # used by coordinator
+    scraper.prepare()
+    # from API cache: no request
+    scraper.extract_playlists()
+    scraper.extract_videos_list()
+
+    nb_units = 0
+    while True:
+        unit = work_dir.claim_unit()
+        if unit is None:
+            break
+        name, videos_ids = unit
+        logger.info(f"worker {worker_id} processing {name} ({len(videos_ids)} videos)")
+        scraper.videos_ids = videos_ids
+        succeeded, failed = scraper.download_media()
+        for video_id in succeeded:
+            work_dir.publish_video(scraper.videos_dir.joinpath(video_id))
+            for rendition in scraper.extra_renditions:
+                rendition_dir = scraper.renditions_dir.joinpath(
+                    rendition.name, "videos", video_id
+                )
+                if rendition_dir.exists():
+                    work_dir.publish_video(
+                        rendition_dir, work_dir.renditions_dir(rendition.name)
+                    )
+        work_dir.complete_unit(name, succeeded, failed)
+        nb_units += 1
+
+    logger.info(f"worker {worker_id} done: processed {nb_units} units")
+    scraper.cleanup()
+
+
+def run_merge(scraper, work_dir):
+    """ build HTML files and ZIM(s) from all units' media """
+
+    pending = work_dir.pending_units()
+    if pending:
+        raise ValueError(f"{len(pending)} units are not processed yet: {pending}")
+
+    scraper.api_cache = work_dir.cache_dir
+    scraper.previous_zim = None  # already carried over by coordinator
+    scraper.prepare()
+    scraper.retrieve_collection()
+
+    succeeded, failed = work_dir.results()
+    logger.info(f"linking media of {len(succeeded)} videos from {work_dir.videos_dir}")
+    folders = [(work_dir.videos_dir, scraper.videos_dir)] + [
+        (
+            work_dir.renditions_dir(rendition.name),
+            scraper.renditions_dir.joinpath(rendition.name, "videos"),
+        )
+        for rendition in scraper.extra_renditions
+    ]
+    for video_id in succeeded:
+        for src_root, dst_root in folders:
+            src_dir = src_root.joinpath(video_id)
+            if not src_dir.exists():
+                continue
+            dst_dir = dst_root.joinpath(video_id)
+            dst_dir.mkdir(parents=True, exist_ok=True)
+            for src in src_dir.iterdir():
+                link_or_copy(src, dst_dir.joinpath(src.name))
+
+    scraper.check_downloads(succeeded, failed)
+    scraper.build(succeeded)
+    scraper.cleanup()
+
+    logger.info("all done!")
+
+
+def run(scraper, role, work_dir, unit_size):
+    work_dir = WorkDir(work_dir)
+    if role == "coordinator":
+        return run_coordinator(scraper, work_dir, unit_size)
+    if role == "worker":
+        return run_worker(scraper, work_dir)
+    return run_merge(scraper, work_dir)
@@ -7,9 +7,10 @@ import argparse
 
 from .constants import NAME, SCRAPER, CHANNEL, PLAYLIST, USER, logger, YOUTUBE
 from .scraper import Youtube2Zim
+from . import distributed
 
 
-def main():
+def get_parser():
     parser = argparse.ArgumentParser(
         prog=NAME,
         description="Scraper to create a ZIM file from a Youtube Channel or Playlists",
@@ -26,6 +27,11 @@ def main():
         "--id", help="Youtube ID of the collection", required=True, dest="youtube_id"
     )
     parser.add_argument("--api-key", help="Youtube API Token", required=True)
+    parser.add_argument(
+        "--api-cache",
+        help="Path to a folder of already retrieved Youtube API JSON files "
+        "(cache folder of another run) to reuse instead of querying the API",
+    )
     parser.add_argument(
         "--name",
         help="ZIM name. Used as identifier and filename (date will be appended)",
@@ -45,12 +51,57 @@ def main():
         action="store_true",
         default=False,
     )
+    parser.add_argument(
+        "--audio-only",
+        help="Only download and include audio (Opus in webm, AAC in mp4). "
+        "Thumbnail is used as poster in the player",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--extra-renditions",
+        help="Comma-separated list of additional <format>-<quality> renditions "
+        "(ex: webm-low,mp4-high) encoded from the same download. "
+        "One build folder and ZIM (name suffixed with rendition) per rendition",
+    )
+    parser.add_argument(
+        "--fused-transcode",
+        help="In low-quality mode, mux and re-encode separate video and audio streams "
+        "in a single ffmpeg pass instead of merging them first",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--chunked-encode-above",
+        help="Re-encode videos longer than this (in seconds) as keyframe-aligned "
+        "chunks encoded in parallel. Disabled by default",
+        type=int,
+    )
+    parser.add_argument(
+        "--encode-workers",
+        help="Number of parallel ffmpeg processes per chunked video. "
+        "Defaults to CPU count divided by --concurrency",
+        type=int,
+    )
     parser.add_argument(
         "--all-subtitles",
         help="Include auto-generated subtitles",
         action="store_true",
         default=False,
     )
+    parser.add_argument(
+        "--subtitles-langs",
+        help="Comma-separated list of subtitles languages to include, by priority. "
+        "`original` stands for all tracks uploaded by author. "
+        "Ex: original,en,fr. Defaults to all tracks: uploaded ones "
+        "then auto-generated ones (with --all-subtitles)",
+    )
+    parser.add_argument(
+        "--subtitles-max",
+        help="Maximum number of subtitles tracks per video, by --subtitles-langs "
+        "priority, not counting `original` ones (original+N)",
+        type=int,
+    )
     parser.add_argument(
         "--pagination",
         help="Number of videos per page",
@@ -64,6 +115,20 @@ def main():
         action="store_true",
         default=False,
     )
+    parser.add_argument(
+        "--static-listings",
+        help="Also write static (no JS) listing pages for each playlist, used as "
+        "ZIM main page for a faster start",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--search-descriptions",
+        help="Also index videos descriptions for home page search (titles only "
+        "otherwise). Makes search index much larger",
+        action="store_true",
+        default=False,
+    )
 
     parser.add_argument(
         "--output",
@@ -192,14 +257,102 @@ def main():
         action="store_true",
     )
 
+    parser.add_argument(
+        "--shard-by",
+        help="Split collection into several ZIMs (name and title suffixed): "
+        "by estimated size (see --shard-max-size), publication year or playlist",
+        choices=["size", "year", "playlist"],
+    )
+
+    parser.add_argument(
+        "--shard-max-size",
+        help="Maximum estimated size of a shard with --shard-by size, in GB. "
+        "Defaults to 3",
+        type=int,
+        default=3,
+    )
+
+    parser.add_argument(
+        "--only-shard",
+        help="Only download and build this shard (suffix of its name: `2019`, "
+        "`part2`, playlist slug). To build shards on separate workers",
+    )
+
+    parser.add_argument(
+        "--distributed",
+        help="Role in a distributed build sharing --work-dir: coordinator "
+        "retrieves collection and creates work units, workers (any number) "
+        "process units, merge builds ZIM(s) once all units are done",
+        choices=distributed.ROLES,
+    )
+
+    parser.add_argument(
+        "--work-dir",
+        help="Folder shared by all participants of a distributed build",
+    )
+
+    parser.add_argument(
+        "--unit-size",
+        help="Number of videos per work unit in distributed mode. Defaults to 50",
+        type=int,
+        default=50,
+    )
+
+    parser.add_argument(
+        "--previous-zim",
+        help="Path to a ZIM of a previous run of the same collection. Videos, "
+        "thumbnails and subtitles of videos still present are reused from it "
+        "if it was built with same format, quality and subtitles options. "
+        "ZIMs not recording those are assumed built with default ones",
+    )
+
+    parser.add_argument(
+        "--local-cache",
+        help="Path to a folder to use as local optimization cache, checked before "
+        "the S3 one. Can be shared by concurrent builds on the same host",
+    )
+
+    parser.add_argument(
+        "--local-cache-size",
+        help="Maximum size of the local optimization cache, in GB. "
+        "Least recently used files are evicted. 0 for no limit. Defaults to 50",
+        type=int,
+        default=50,
+    )
+
+    return parser
+
+
+def check_args(args):
+    """ raise ValueError on parsed arguments argparse can't validate """
+    if args.max_concurrency < 1:
+        raise ValueError(f"Invalid concurrency value: {args.max_concurrency}")
+    if args.distributed and not args.work_dir:
+        raise ValueError("--work-dir is mandatory in distributed mode")
+
+
+def run(args):
+    """ run scraper (or its distributed role) from parsed arguments """
+
+    check_args(args)
+    kwargs = dict(args._get_kwargs())
+    role, work_dir, unit_size = [
+        kwargs.pop(key) for key in ("distributed", "work_dir", "unit_size")
+    ]
+    scraper = Youtube2Zim(**kwargs, youtube_store=YOUTUBE)
+    if role:
+        distributed.run(scraper, role, work_dir, unit_size)
+    else:
+        scraper.run()
+
+
+def main():
+    parser = get_parser()
     args = parser.parse_args()
     logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
 
     try:
-        if args.max_concurrency < 1:
-            raise ValueError(f"Invalid concurrency value: {args.max_concurrency}")
-        scraper = Youtube2Zim(**dict(args._get_kwargs()), youtube_store=YOUTUBE)
-        scraper.run()
+        run(args)
     except Exception as exc:
         logger.error(f"FAILED. An error occurred: {exc}")
         if args.debug:
@@ -56,6 +56,13 @@ def main():
         "--metadata-from",
         help="File path or URL to a JSON file holding custom metadata for individual playlists. Format in README",
     )
+    parser.add_argument(
+        "--playlists-concurrency",
+        help="Number of playlists ZIMs to build in parallel. --concurrency and "
+        "--encode-workers are shared between those. Defaults to 1",
+        type=int,
+        default=1,
+    )
     parser.add_argument(
         "--debug", help="Enable verbose output", action="store_true", default=False
     )
@@ -79,6 +86,9 @@ def main():
     if args.playlists_mode and not args.playlists_name:
         parser.error("--playlists-name is mandatory in playlists mode")
 
+    if args.playlists_concurrency < 1:
+        parser.error(f"Invalid --playlists-concurrency: {args.playlists_concurrency}")
+
     logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
 
     from .scraper import YoutubeHandler
@@ -5,25 +5,66 @@
 """
     Youtube Playlists to individual ZIMs scraper
 
-    Invokes youtube2zim scraper individally for each playlist
+    Runs youtube2zim scraper individally for each playlist, in a pool of
+    worker processes reused between playlists
     Also forwards regular requests to youtube2zim (can be used as generic entrypoint)
 
     - Uploads playlist (all videos of the channel) is excluded
     - Only displays youtube2zim's output on failure
+    - Optimized media are shared between playlists via a local cache
+    - Youtube API results are shared between playlists via --api-cache
+    - Several playlists can be built in parallel (--playlists-concurrency)
 """
 
+import io
+import os
 import sys
 import json
 import shutil
+import logging
 import pathlib
 import tempfile
 import subprocess
+import concurrent.futures
 
 import requests
 from zimscraperlib.logging import nicer_args_join
 
 from ..constants import logger, NAME, YOUTUBE, PLAYLIST
-from ..youtube import extract_playlists_details_from, credentials_ok
+from ..entrypoint import get_parser, run
+from ..youtube import extract_playlists_details_from, credentials_ok, load_api_cache
+from ..utils import get_argument_value
+
+
+def run_playlist_job(args):
+    """run youtube2zim with args in a pool worker. returns (success, output)
+
+    Workers outlive jobs so imports, API session, validated credentials
+    and the shared API cache (see load_api_cache) are only set up once.
+    Output is captured and only displayed by the parent on failure"""
+
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s:%(message)s"))
+    console_handlers = list(logger.handlers)
+    for console_handler in console_handlers:
+        logger.removeHandler(console_handler)
+    logger.addHandler(handler)
+    try:
+        parsed_args = get_parser().parse_args(args)
+        logger.setLevel(logging.DEBUG if parsed_args.debug else logging.INFO)
+        run(parsed_args)
+    except (Exception, SystemExit) as exc:
+        logger.error(f"FAILED. An error occurred: {exc}")
+        logger.exception(exc)
+        success = False
+    else:
+        success = True
+    finally:
+        logger.removeHandler(handler)
+        for console_handler in console_handlers:
+            logger.addHandler(console_handler)
+    return success, output.getvalue()
 
 
 class YoutubeHandler(object):
@@ -44,6 +85,7 @@ class YoutubeHandler(object):
             pathlib.Path(self.metadata_from) if self.metadata_from else None
         )
         self.metadata = {}  # custom metadata holder
+        self.media_store = None  # shared local cache for all playlists
 
         # update youtube credentials store
         YOUTUBE.update(
@@ -97,37 +139,119 @@ class YoutubeHandler(object):
             )
         )
 
-        # no need for build_dir anymore
-        shutil.rmtree(self.build_dir, ignore_errors=True)
+        # videos often are in several playlists: store optimized files in
+        # a local cache shared by all runs (unless one was requested)
+        if get_argument_value("local-cache", self.extra_args) is None:
+            tmp_dir = get_argument_value("tmp-dir", self.extra_args)
+            if tmp_dir:
+                pathlib.Path(tmp_dir).mkdir(parents=True, exist_ok=True)
+            self.media_store = pathlib.Path(
+                tempfile.mkdtemp(prefix="media_store_", dir=tmp_dir)
+            )
+            logger.info(f"Sharing optimized media via {self.media_store}")
 
+        selected_playlists = []
         for playlist in playlists:
             if playlist.playlist_id == uploads_playlist_id:
                 logger.info(f"Skipping playlist {playlist.playlist_id} (uploads one)")
                 continue
+            selected_playlists.append(playlist)
 
-            logger.info(f"Executing youtube2zim for playlist {playlist.playlist_id}")
-            success, process = self.run_playlist_zim(playlist)
-            if success:
-                logger.info(".. OK")
-            else:
-                logger.error(".. ERROR. Printing scraper output and exiting.")
-                logger.error(process.stdout)
-                return process.returncode
+        # loaded before workers are forked so they inherit it
+        load_api_cache(self.api_cache)
 
-    def run_playlist_zim(self, playlist):
-        """ run youtube2zim for an individual playlist """
+        try:
+            return self.run_playlists_zims(selected_playlists)
+        finally:
+            # API cache (build_dir) is used by all youtube2zim runs
+            shutil.rmtree(self.build_dir, ignore_errors=True)
+            if self.media_store:
+                shutil.rmtree(self.media_store, ignore_errors=True)
+
+    def run_playlists_zims(self, playlists):
+        """run youtube2zim for all playlists, --playlists-concurrency at a time
+
+        returns 1 if a run failed (other runs are completed but no new one
+        is started) or None"""
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.playlists_concurrency
+        ) as executor:
+            futures = {}
+            for playlist in playlists:
+                logger.info(f"Executing youtube2zim for {playlist.playlist_id}")
+                args = self.get_playlist_args(playlist)
+                logger.debug(nicer_args_join(args))
+                futures[executor.submit(run_playlist_job, args)] = playlist
+            returncode = None
+            for future in concurrent.futures.as_completed(futures):
+                if future.cancelled():
+                    continue
+                playlist_id = futures[future].playlist_id
+                success, output = future.result()
+                if success:
+                    logger.info(f".. {playlist_id} OK")
+                    continue
+                logger.error(
+                    f".. {playlist_id} ERROR. Printing scraper output and exiting."
+                )
+                logger.error(output)
+                if returncode is None:
+                    returncode = 1
+                    for other in futures:
+                        other.cancel()
+        return returncode
+
+    @property
+    def child_resources_args(self):
+        """ youtube2zim args splitting CPU/network budget between parallel runs """
+
+        if self.playlists_concurrency <= 1:
+            return []
+        args = []
+        concurrency = get_argument_value("concurrency", self.extra_args)
+        if concurrency:
+            args += [
+                "--concurrency",
+                str(max(1, int(concurrency) // self.playlists_concurrency)),
+            ]
+        encode_workers = get_argument_value("encode-workers", self.extra_args)
+        args += [
+            "--encode-workers",
+            str(
+                max(
+                    1,
+                    int(encode_workers or os.cpu_count() or 1)
+                    // self.playlists_concurrency,
+                )
+            ),
+        ]
+        return args
+
+    @property
+    def api_cache(self):
+        """ API results of this run, reused by playlists runs """
+        return YOUTUBE.cache_dir.resolve()
+
+    def get_playlist_args(self, playlist):
+        """ youtube2zim args for an individual playlist """
 
         playlist_id = playlist.playlist_id
-        args = self.youtube2zim_exe + [
+        args = [
             "--type",
             PLAYLIST,
             "--id",
             playlist_id,
             "--api-key",
             self.api_key,
+            "--api-cache",
+            str(self.api_cache),
         ]
         if self.debug:
             args.append("--debug")
+        if self.media_store:
+            # no eviction: store is removed once all playlists are done
+            args += ["--local-cache", str(self.media_store), "--local-cache-size", "0"]
 
         # set metadata args for playlist
         metadata = self.metadata.get(playlist_id, {})
@@ -153,14 +277,9 @@ class YoutubeHandler(object):
         # append regular youtube2zim args
         args += self.extra_args
 
-        logger.debug(nicer_args_join(args))
-        process = subprocess.run(
-            args,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-        )
-        return process.returncode == 0, process
+        # last occurence of an arg wins
+        args += self.child_resources_args
+        return args
 
     def handle_single_zim(self):
         """ redirect request to standard youtube2zim """
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: ai ts=4 sts=4 et sw=4 nu
+
+import json
+from pathlib import Path
+
+from libzim.reader import File
+
+from .constants import logger
+
+# options recorded in metadata.json since --previous-zim: older ZIMs only
+# have video_format: assume they were built with default options
+LEGACY_METADATA = {
+    "video_quality": "high",
+    "audio_only": False,
+    "subtitles": "uploaded",
+}
+
+
+class PreviousZim(object):
+    """media of a ZIM from a previous run, to carry over into a new build
+
+    Entries are scanned once on open and indexed by video ID"""
+
+    def __init__(self, fpath):
+        self.fpath = Path(fpath).expanduser().resolve()
+        self.zim = File(str(self.fpath))
+        self.metadata = self.read_metadata()
+        self.videos = self.scan_videos()
+
+    def read_metadata(self):
+        """ content-related data of the ZIM (from its metadata.json) """
+        try:
+            return json.loads(
+                bytes(self.zim.get_article("-/metadata.json").content).decode("utf-8")
+            )
+        except Exception as exc:
+            logger.debug(f"Unable to read metadata.json from {self.fpath}: {exc}")
+            return {}
+
+    def scan_videos(self):
+        """ {video_id: {filename: article_id}} for all files in videos/ """
+        videos = {}
+        for article_id in range(self.zim.article_count):
+            article = self.zim.get_article_by_id(article_id)
+            parts = article.url.split("/")
+            if article.is_redirect or len(parts) != 3 or parts[0] != "videos":
+                continue
+            videos.setdefault(parts[1], {})[parts[2]] = article_id
+        return videos
+
+    def matches(self, **options):
+        """ whether ZIM was built with those metadata.json options """
+        metadata = dict(LEGACY_METADATA, **self.metadata)
+        return all(metadata.get(key) == value for key, value in options.items())
+
+    def extract_video(self, video_id, video_dir, video_format, with_subtitles=True):
+        """ whether video and thumbnail (and subtitles) were extracted to video_dir """
+        files = self.videos.get(video_id, {})
+        if f"video.{video_format}" not in files or "video.webp" not in files:
+            return False
+
+        video_dir.mkdir(parents=True, exist_ok=True)
+        for fname, article_id in files.items():
+            if not with_subtitles and fname.endswith(".vtt"):
+                continue
+            with open(video_dir.joinpath(fname), "wb") as fh:
+                fh.write(self.zim.get_article_by_id(article_id).content)
+        return True
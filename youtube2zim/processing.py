@@ -2,11 +2,242 @@
 # -*- coding: utf-8 -*-
 # vim: ai ts=4 sts=4 et sw=4 nu
 
+import re
+import tempfile
+import subprocess
+import concurrent.futures
+from pathlib import Path
+
+from zimscraperlib.logging import nicer_args_join
 from zimscraperlib.video.encoding import reencode
+from zimscraperlib.video.config import Config
+from zimscraperlib.video.presets import (
+    VideoWebmLow,
+    VideoMp4Low,
+    VideoWebmHigh,
+    VideoMp4High,
+)
 from zimscraperlib.image.optimization import optimize_image
 from zimscraperlib.image.transformation import resize_image
 
 from .constants import logger
+from .utils import link_or_copy
+
+# length of segments in chunked encoding (actual cuts are on next keyframe)
+CHUNK_DURATION = 180
+# preset options that apply to audio stream and to output container
+AUDIO_OPTIONS = ("-codec:a", "-ar", "-b:a", "-ac")
+MUXER_OPTIONS = ("-movflags", "-max_muxing_queue_size")
+
+
+class AudioWebmLow(Config):
+    """Low quality Opus audio in webm container
+
+    48Khz audio sampling (Opus native)
+    48k audio bitrate
+    audio-only"""
+
+    VERSION = 1
+
+    options = {
+        "-vn": "",  # remove video stream
+        "-codec:a": "libopus",  # audio codec
+        "-ar": "48000",  # audio sampling rate
+        "-b:a": "48k",  # target audio bitrate
+    }
+
+
+class AudioMp4Low(Config):
+    """Low quality AAC audio in mp4 container
+
+    44Khz audio sampling
+    48k audio bitrate
+    audio-only"""
+
+    VERSION = 1
+
+    options = {
+        "-vn": "",  # remove video stream
+        "-codec:a": "aac",  # audio codec
+        "-ar": "44100",  # audio sampling rate
+        "-b:a": "48k",  # target audio bitrate
+        "-movflags": "+faststart",  # extra flag
+    }
+
+
+class AudioWebmHigh(Config):
+    """High quality Opus audio in webm container
+
+    48Khz audio sampling (Opus native)
+    128k audio bitrate
+    audio-only"""
+
+    VERSION = 1
+
+    options = {
+        "-vn": "",  # remove video stream
+        "-codec:a": "libopus",  # audio codec
+        "-ar": "48000",  # audio sampling rate
+        "-b:a": "128k",  # target audio bitrate
+    }
+
+
+class AudioMp4High(Config):
+    """High quality AAC audio in mp4 container
+
+    44Khz audio sampling
+    128k audio bitrate
+    audio-only"""
+
+    VERSION = 1
+
+    options = {
+        "-vn": "",  # remove video stream
+        "-codec:a": "aac",  # audio codec
+        "-ar": "44100",  # audio sampling rate
+        "-b:a": "128k",  # target audio bitrate
+        "-movflags": "+faststart",  # extra flag
+    }
+
+
+class Rendition(object):
+    """ a media output flavour: format, quality and whether audio-only """
+
+    def __init__(self, video_format, low_quality, audio_only=False):
+        self.video_format = video_format
+        self.low_quality = low_quality
+        self.audio_only = audio_only
+
+    @classmethod
+    def from_name(cls, name, audio_only=False):
+        """ Rendition from a `<format>-<quality>` string (ex: `webm-low`) """
+        try:
+            video_format, quality = name.strip().split("-")
+            if video_format not in ("webm", "mp4") or quality not in ("low", "high"):
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Invalid rendition `{name}`. Use <webm|mp4>-<low|high>")
+        return cls(video_format, quality == "low", audio_only)
+
+    @property
+    def quality(self):
+        return "low" if self.low_quality else "high"
+
+    @property
+    def name(self):
+        return f"{self.video_format}-{self.quality}"
+
+    @property
+    def preset(self):
+        """ encoding preset (high ones only apply to format conversions) """
+        if self.audio_only:
+            presets = (
+                {"mp4": AudioMp4Low, "webm": AudioWebmLow}
+                if self.low_quality
+                else {"mp4": AudioMp4High, "webm": AudioWebmHigh}
+            )
+        else:
+            presets = (
+                {"mp4": VideoMp4Low, "webm": VideoWebmLow}
+                if self.low_quality
+                else {"mp4": VideoMp4High, "webm": VideoWebmHigh}
+            )
+        return presets[self.video_format]()
+
+    @property
+    def cache_folder(self):
+        """folder of its files in optimization cache
+
+        high ones include their preset: format conversions once used the low
+        presets and those files must not be served as high quality"""
+        prefix = "audio/" if self.audio_only else ""
+        if self.low_quality:
+            return f"{prefix}{self.video_format}/low"
+        return f"{prefix}{self.video_format}/high/{type(self.preset).__name__}"
+
+    @property
+    def estimated_bitrate(self):
+        """ kbps estimate of output files, for planning only """
+        if not self.low_quality:  # not re-encoded: depends on youtube's files
+            return 160 if self.audio_only else 1000
+        return (parse_bitrate(self.preset.target_video_bitrate) or 0) + (
+            parse_bitrate(self.preset.target_audio_bitrate) or 0
+        )
+
+    @property
+    def mimetype(self):
+        return f"{'audio' if self.audio_only else 'video'}/{self.video_format}"
+
+    def needs_reencode(self, src_path):
+        """ whether a downloaded file must be re-encoded for this rendition """
+        src_format = src_path.suffix[1:]
+        # m4a is audio-only mp4
+        if self.audio_only and src_format == "m4a":
+            src_format = "mp4"
+        return self.low_quality or src_format != self.video_format
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Rendition)
+            and self.name == other.name
+            and self.audio_only == other.audio_only
+        )
+
+    def __repr__(self):
+        return f"Rendition({self.name})"
+
+
+def parse_bitrate(value):
+    """ kbps integer from an ffmpeg bitrate value (`300k`, `1M`) or None """
+    match = re.match(r"^(\d+)([kKmM]?)$", str(value or ""))
+    if not match:
+        return None
+    return int(match.group(1)) * (1000 if match.group(2) in ("m", "M") else 1)
+
+
+def get_preset_width(preset):
+    """ target frame width (px) of a video preset or None if not scaling """
+    match = re.match(r"^'?(\d+):", preset.video_scale or "")
+    return int(match.group(1)) if match else None
+
+
+def get_format_selector(video_format, preset, low_quality, audio_only=False):
+    """youtube_dl format selector for a video_format and encoding preset
+
+    regular quality: best stream in requested format (no re-encoding needed)
+    low quality: smallest stream at or above preset's target width and bitrates
+    as we re-encode it anyway. `?` allows streams with unknown values
+    audio-only: same logic applied to audio streams only"""
+
+    audext, vidext = {"webm": ("webm", "webm"), "mp4": ("m4a", "mp4")}[video_format]
+    abr = parse_bitrate(preset.target_audio_bitrate)
+
+    if audio_only:
+        if not low_quality:
+            return f"bestaudio[ext={audext}]/bestaudio"
+        return f"worstaudio[abr>=?{abr}]/bestaudio" if abr else "bestaudio"
+
+    best = f"best[ext={vidext}]/bestvideo[ext={vidext}]+bestaudio[ext={audext}]/best"
+    if not low_quality:
+        return best
+
+    width = get_preset_width(preset)
+    vbr = parse_bitrate(preset.target_video_bitrate)
+
+    video_filters = f"[width>=?{width}]" if width else ""
+    audio_filters = f"[abr>=?{abr}]" if abr else ""
+    single_filters = video_filters
+    if vbr:
+        video_filters += f"[vbr>=?{vbr}]"
+        single_filters += f"[tbr>=?{vbr + (abr or 0)}]"
+
+    return "/".join(
+        [
+            f"worst{single_filters}",
+            f"worstvideo{video_filters}+worstaudio{audio_filters}",
+            best,
+        ]
+    )
 
 
 def process_thumbnail(thumbnail_path, preset):
@@ -29,11 +260,197 @@ def process_thumbnail(thumbnail_path, preset):
     return True
 
 
-def post_process_video(video_dir, video_id, preset, video_format, low_quality):
+def run_ffmpeg(args):
+    """ run an ffmpeg command, raising CalledProcessError on failure """
+    logger.debug(nicer_args_join(args))
+    return subprocess.run(
+        args,
+        stderr=subprocess.STDOUT,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+
+def merge_and_reencode(video_path, audio_path, dst_path, preset):
+    """mux and re-encode separate video and audio streams in a single ffmpeg pass
+
+    saves youtube_dl's intermediate merged file (write + decode) and a process"""
+    tmp_path = dst_path.with_name(f"video.tmp{dst_path.suffix}")
+    args = (
+        ["ffmpeg", "-y", "-i", f"file:{video_path}", "-i", f"file:{audio_path}"]
+        + ["-map", "0:v:0", "-map", "1:a:0"]
+        + preset.to_ffmpeg_args()
+        + [f"file:{tmp_path}"]
+    )
+    logger.info(f"Merge+Encode {video_path.parent} -> {dst_path}")
+    try:
+        run_ffmpeg(args)
+    except subprocess.CalledProcessError:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+    video_path.unlink()
+    audio_path.unlink()
+    tmp_path.replace(dst_path)
+
+
+def get_duration(src_path):
+    """ duration in seconds of a media file (0 if unknown) """
+    ffprobe = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "quiet",
+            "-show_entries",
+            "format=duration",
+            "-of",
+            "csv=p=0",
+            f"file:{src_path}",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    try:
+        return float(ffprobe.stdout.strip())
+    except ValueError:
+        return 0
+
+
+def reencode_in_chunks(src_path, dst_path, preset, workers):
+    """re-encode a long video by encoding keyframe-aligned chunks in parallel
+
+    - video stream is split (stream copy) into ~CHUNK_DURATION segments
+    - each segment is encoded by its own ffmpeg process, `workers` at a time
+    - encoded segments are concatenated (stream copy) while audio is encoded
+      once from source to prevent gaps at chunks boundaries"""
+
+    video_args, audio_args, muxer_args = [], [], []
+    for key, value in preset.items():
+        target = (
+            audio_args
+            if key in AUDIO_OPTIONS
+            else muxer_args
+            if key in MUXER_OPTIONS
+            else video_args
+        )
+        target += [key, value] if value else [key]
+
+    with tempfile.TemporaryDirectory(dir=dst_path.parent) as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        logger.info(f"Splitting {src_path} in chunks for parallel encoding")
+        run_ffmpeg(
+            ["ffmpeg", "-y", "-i", f"file:{src_path}", "-map", "0:v:0", "-c", "copy"]
+            + ["-f", "segment", "-segment_time", str(CHUNK_DURATION)]
+            + ["-reset_timestamps", "1", str(tmp_dir.joinpath("chunk_%05d.mkv"))]
+        )
+        chunks = sorted(tmp_dir.glob("chunk_*.mkv"))
+
+        def encode_chunk(chunk):
+            encoded = chunk.with_name(f"{chunk.stem}.enc{dst_path.suffix}")
+            run_ffmpeg(
+                ["ffmpeg", "-y", "-i", f"file:{chunk}"]
+                + video_args
+                + ["-an", f"file:{encoded}"]
+            )
+            return encoded
+
+        logger.info(f"Encoding {len(chunks)} chunks of {src_path} ({workers} workers)")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            encoded_chunks = list(executor.map(encode_chunk, chunks))
+
+        concat_list = tmp_dir.joinpath("chunks.txt")
+        with open(concat_list, "w") as fh:
+            for encoded in encoded_chunks:
+                fh.write(f"file '{encoded.name}'\n")
+
+        tmp_path = tmp_dir.joinpath(f"video.tmp{dst_path.suffix}")
+        run_ffmpeg(
+            ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list)]
+            + ["-i", f"file:{src_path}", "-map", "0:v:0", "-map", "1:a:0?"]
+            + ["-codec:v", "copy"]
+            + audio_args
+            + muxer_args
+            + [f"file:{tmp_path}"]
+        )
+        src_path.unlink()
+        tmp_path.replace(dst_path)
+
+
+def reencode_renditions(src_paths, outputs):
+    """encode source into several renditions, decoding it once
+
+    src_paths: single downloaded file or (video, audio) separate streams
+    outputs: list of (dst_path, rendition)
+
+    Renditions not needing re-encoding are linked to the source file. All the
+    others are outputs of a single ffmpeg invocation. Sources are removed."""
+
+    maps = ["-map", "0:v:0", "-map", "1:a:0"] if len(src_paths) == 2 else []
+    args = ["ffmpeg", "-y"]
+    for src_path in src_paths:
+        args += ["-i", f"file:{src_path}"]
+
+    encoded, linked = [], []
+    for dst_path, rendition in outputs:
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        if len(src_paths) == 1 and not rendition.needs_reencode(src_paths[0]):
+            linked.append(dst_path)
+            continue
+        tmp_path = dst_path.with_name(f"video.tmp{dst_path.suffix}")
+        args += maps + rendition.preset.to_ffmpeg_args() + [f"file:{tmp_path}"]
+        encoded.append((tmp_path, dst_path))
+
+    if encoded:
+        logger.info(
+            f"Encode {src_paths[0].parent} -> {', '.join(r.name for _, r in outputs)}"
+        )
+        try:
+            run_ffmpeg(args)
+        except subprocess.CalledProcessError:
+            for tmp_path, _ in encoded:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            raise
+
+    for dst_path in linked:
+        if dst_path != src_paths[0]:
+            link_or_copy(src_paths[0], dst_path)
+    for src_path in src_paths:
+        if src_path not in linked:
+            src_path.unlink()
+    for tmp_path, dst_path in encoded:
+        tmp_path.replace(dst_path)
+
+
+def post_process_video(
+    video_dir,
+    video_id,
+    preset,
+    video_format,
+    low_quality,
+    streams=None,
+    chunked_above=None,
+    encode_workers=1,
+    renditions=None,
+    audio_only=False,
+):
     """apply custom post-processing to downloaded video
 
     - resize thumbnail
-    - recompress video if incorrect video_format or low_quality requested"""
+    - recompress video if incorrect video_format or low_quality requested
+    - mux and recompress in one pass if separate (video, audio) streams passed
+    - recompress in parallel chunks if longer than chunked_above seconds
+    - encode all extra renditions (list of (dst_path, rendition)) in one pass"""
+
+    dst_path = video_dir.joinpath(f"video.{video_format}")
+    main_output = (dst_path, Rendition(video_format, low_quality, audio_only))
+    if streams and renditions:
+        return reencode_renditions(list(streams), [main_output] + renditions)
+
+    if streams:
+        return merge_and_reencode(*streams, dst_path, preset)
 
     # find downloaded video from video_dir
     files = [
@@ -52,11 +469,17 @@ def post_process_video(video_dir, video_id, preset, video_format, low_quality):
         )
     src_path = files[0]
 
+    if renditions:
+        return reencode_renditions([src_path], [main_output] + renditions)
+
     # don't reencode if not requesting low-quality and received wanted format
-    if not low_quality and src_path.suffix[1:] == video_format:
+    if not main_output[1].needs_reencode(src_path):
+        if src_path != dst_path:
+            src_path.replace(dst_path)
         return
 
-    dst_path = src_path.with_name(f"video.{video_format}")
+    if chunked_above and not audio_only and get_duration(src_path) > chunked_above:
+        return reencode_in_chunks(src_path, dst_path, preset, encode_workers)
     reencode(
         src_path, dst_path, preset.to_ffmpeg_args(), delete_src=True, failsafe=False
     )
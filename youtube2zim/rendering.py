@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: ai ts=4 sts=4 et sw=4 nu
+
+"""
+    Rendering of articles (one HTML file per video) over a process pool
+
+    Template is compiled once in the main process and loaded by workers
+    from a shared bytecode cache
+"""
+
+import shutil
+import tempfile
+import functools
+import concurrent.futures
+from pathlib import Path
+
+import jinja2
+
+CHUNK_SIZE = 500  # articles per worker task
+PARALLEL_ABOVE = 2000  # pool startup isn't worth it for fewer articles
+
+environment = None  # jinja2 environment of current process
+
+
+def get_environment(templates_dir, bytecode_dir):
+    """ jinja2 environment of current process, created on first use """
+    global environment
+    if environment is None:
+        environment = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(str(templates_dir)),
+            autoescape=True,
+            bytecode_cache=jinja2.FileSystemBytecodeCache(str(bytecode_dir)),
+        )
+    return environment
+
+
+def render_chunk(templates_dir, bytecode_dir, build_dir, articles):
+    """ render article.html with each (fname, context) into build_dir """
+    template = get_environment(templates_dir, bytecode_dir).get_template("article.html")
+    for fname, context in articles:
+        with open(Path(build_dir).joinpath(fname), "w", encoding="utf-8") as fp:
+            fp.write(template.render(**context))
+    return len(articles)
+
+
+def render_articles(templates_dir, build_dir, articles, workers, tmp_dir=None):
+    """render all articles ([(fname, context)]), in parallel if many
+
+    Output is the same as rendering serially: for duplicate fnames, the
+    last context wins. Template bytecode is cached in a folder of tmp_dir"""
+
+    global environment
+    articles = list(dict(articles).items())
+    bytecode_dir = tempfile.mkdtemp(prefix="jinja_", dir=tmp_dir)
+    environment = None  # bound to a previous (removed) bytecode_dir
+    try:
+        if workers <= 1 or len(articles) < PARALLEL_ABOVE:
+            render_chunk(templates_dir, bytecode_dir, build_dir, articles)
+            return
+
+        # compile template before workers start so they load it from cache
+        get_environment(templates_dir, bytecode_dir).get_template("article.html")
+        chunks = [
+            articles[index : index + CHUNK_SIZE]
+            for index in range(0, len(articles), CHUNK_SIZE)
+        ]
+        # no initializer (python 3.7+): workers create environment lazily
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(
+                functools.partial(render_chunk, templates_dir, bytecode_dir, build_dir),
+                chunks,
+            ):
+                pass
+    finally:
+        environment = None
+        shutil.rmtree(bytecode_dir, ignore_errors=True)
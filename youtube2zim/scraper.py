@@ -10,43 +10,65 @@
 
 import os
 import json
+import math
 import locale
 import shutil
 import tempfile
 import subprocess
 import datetime
 import functools
+import contextlib
 from pathlib import Path
 import concurrent.futures
 from gettext import gettext as _
 
 import jinja2
+import requests
 import youtube_dl
+from youtube_dl.downloader import get_suitable_downloader
 from pif import get_public_ip
 from babel.dates import format_date
 from dateutil import parser as dt_parser
 from kiwixstorage import KiwixStorage
+from boto3.s3.transfer import TransferConfig
 from zimscraperlib.download import save_file
 from zimscraperlib.zim import make_zim_file
 from zimscraperlib.fix_ogvjs_dist import fix_source_dir
 from zimscraperlib.image.presets import WebpHigh
 from zimscraperlib.image.transformation import resize_image
 from zimscraperlib.image.probing import get_colors, is_hex_color
-from zimscraperlib.video.presets import VideoWebmLow, VideoMp4Low
 from zimscraperlib.i18n import get_language_details, setlocale
 
 from .youtube import (
     get_channel_json,
     credentials_ok,
     extract_playlists_details_from,
+    load_api_cache,
     get_videos_json,
     get_videos_authors_info,
+    get_videos_durations,
     save_channel_branding,
     skip_deleted_videos,
     skip_outofrange_videos,
 )
-from .utils import clean_text, load_json, save_json, get_slug
-from .processing import post_process_video, process_thumbnail
+from .cache import LocalCache
+from .previous_zim import PreviousZim
+from .rendering import render_articles
+from .search import build_search_index
+from .utils import (
+    clean_text,
+    load_json,
+    save_json,
+    get_slug,
+    link_or_copy,
+    to_js_json,
+)
+from .processing import (
+    post_process_video,
+    process_thumbnail,
+    get_format_selector,
+    Rendition,
+)
 from .constants import (
     logger,
     ROOT_DIR,
@@ -55,6 +77,11 @@ from .constants import (
     USER,
     SCRAPER,
     YOUTUBE_LANG_MAP,
+    THUMBNAILS_QUALITIES,
+    SUBTITLES_CACHE_VERSION,
+    SUBTITLES_INDEX_PERIOD,
+    LISTING_DESCRIPTION_LENGTH,
+    DATA_BLOCK_SIZE,
 )
 
 
@@ -92,21 +119,71 @@ class Youtube2Zim(object):
         banner_image=None,
         main_color=None,
         secondary_color=None,
+        fused_transcode=False,
+        chunked_encode_above=None,
+        encode_workers=None,
+        extra_renditions=None,
+        audio_only=False,
+        subtitles_langs=None,
+        subtitles_max=None,
+        local_cache=None,
+        local_cache_size=50,
+        api_cache=None,
+        previous_zim=None,
+        shard_by=None,
+        shard_max_size=3,
+        only_shard=None,
+        search_descriptions=False,
+        static_listings=False,
     ):
         # data-retrieval info
         self.collection_type = collection_type
         self.youtube_id = youtube_id
         self.api_key = api_key
+        self.api_cache = Path(api_cache).expanduser().resolve() if api_cache else None
         self.dateafter = dateafter
 
         # video-encoding info
         self.video_format = video_format
         self.low_quality = low_quality
+        self.audio_only = audio_only
+        self.fused_transcode = fused_transcode
+        self.chunked_encode_above = chunked_encode_above
+        # default splits CPUs among concurrent downloads (each re-encoding)
+        self.encode_workers = encode_workers or max(
+            1, (os.cpu_count() or 1) // max(1, max_concurrency)
+        )
+        self.extra_renditions = [
+            Rendition.from_name(name, audio_only=self.audio_only)
+            for name in (extra_renditions or "").split(",")
+            if name.strip()
+        ]
+        if self.main_rendition in self.extra_renditions:
+            raise ValueError(
+                f"{self.main_rendition.name} is already the main rendition"
+            )
+
+        # sharding: one ZIM per (label, title, videos_ids, playlists)
+        self.shard_by = shard_by
+        self.shard_max_size = shard_max_size * 2 ** 30
+        self.only_shard = only_shard
+        self.shards = []
+        if self.only_shard and not self.shard_by:
+            raise ValueError("--only-shard requires --shard-by")
+        if self.shard_by and self.extra_renditions:
+            raise ValueError("--shard-by can't be used with --extra-renditions")
 
         # options & zim params
         self.nb_videos_per_page = nb_videos_per_page
         self.all_subtitles = all_subtitles
+        self.subtitles_langs = [
+            lang.strip() for lang in (subtitles_langs or "").split(",") if lang.strip()
+        ]
+        self.subtitles_max = subtitles_max
+        self.subtitles_period = datetime.date.today().strftime(SUBTITLES_INDEX_PERIOD)
         self.autoplay = autoplay
+        self.search_descriptions = search_descriptions
+        self.static_listings = static_listings
         self.fname = fname
         self.language = language
         self.tags = [t.strip() for t in tags.split(",")]
@@ -131,6 +208,7 @@ class Youtube2Zim(object):
         self.playlists = []
         self.uploads_playlist_id = None
         self.videos_ids = []
+        self.thumbnails_urls = {}  # video_id: list of API thumbnail URLs
         self.main_channel_id = None  # use for branding
 
         # debug/devel options
@@ -140,15 +218,33 @@ class Youtube2Zim(object):
         self.max_concurrency = max_concurrency
 
         # update youtube credentials store
+        self.youtube_store = youtube_store
         youtube_store.update(
             build_dir=self.build_dir, api_key=self.api_key, cache_dir=self.cache_dir
         )
+        # API and thumbnails requests of all workers share its connections
+        youtube_store.resize_session(max_concurrency)
 
         # Optimization-cache
         self.s3_url_with_credentials = s3_url_with_credentials
         self.use_any_optimized_version = use_any_optimized_version
         self.video_quality = "low" if self.low_quality else "high"
         self.s3_storage = None
+        self.cache_prefetched = set()  # keys already downloaded by prefetch
+        self.cache_missing = set()  # keys known to be missing or outdated
+        self.cache_uploads = []  # background uploads futures
+        self.upload_executor = None
+        self.previous_zim = previous_zim
+        self.reused_videos = set()  # videos carried over from previous ZIM
+        self.reused_subtitles = set()
+        self.local_cache = (
+            LocalCache(
+                local_cache,
+                max_size=local_cache_size * 2 ** 30 if local_cache_size else None,
+            )
+            if local_cache
+            else None
+        )
 
         # set and record locale for translations
         locale_name = locale_name or get_language_details(self.language)["iso-639-1"]
@@ -196,6 +292,37 @@ class Youtube2Zim(object):
     def banner_path(self):
         return self.build_dir.joinpath("banner.jpg")
 
+    @property
+    def renditions_dir(self):
+        """ extra renditions' build folders (outside build_dir not to be in ZIM) """
+        return self.build_dir.with_name(f"{self.build_dir.name}_renditions")
+
+    @property
+    def subtitles_indexes_dir(self):
+        """ subtitles indexes for cache (outside build_dir not to be in ZIM) """
+        return self.build_dir.with_name(f"{self.build_dir.name}_subtitles")
+
+    @property
+    def shards_dir(self):
+        """ shards' build folders (outside build_dir not to be in ZIM) """
+        return self.build_dir.with_name(f"{self.build_dir.name}_shards")
+
+    @property
+    def main_rendition(self):
+        return Rendition(self.video_format, self.low_quality, self.audio_only)
+
+    @property
+    def source_rendition(self):
+        """ rendition driving download format: best quality one requested """
+        for rendition in [self.main_rendition] + self.extra_renditions:
+            if not rendition.low_quality:
+                return rendition
+        return self.main_rendition
+
+    @property
+    def video_preset(self):
+        return self.main_rendition.preset
+
     @property
     def is_user(self):
         return self.collection_type == USER
@@ -241,6 +368,18 @@ class Youtube2Zim(object):
     def run(self):
         """ execute the scraper step by step """
 
+        self.prepare()
+        self.retrieve_collection()
+        succeeded, failed = self.download_media()
+        self.check_downloads(succeeded, failed)
+        self.build(succeeded)
+        self.cleanup()
+
+        logger.info("all done!")
+
+    def prepare(self):
+        """ validate inputs and credentials and prepare build folder """
+
         # validate dateafter input
         self.validate_dateafter_input()
 
@@ -250,9 +389,15 @@ class Youtube2Zim(object):
         logger.info("preparing build folder at {}".format(self.build_dir.resolve()))
         self.prepare_build_folder()
 
-        logger.info("testing Youtube credentials")
-        if not credentials_ok():
-            raise ValueError("Unable to connect to Youtube API v3. check `API_KEY`.")
+        # credentials were validated by the run that filled the API cache
+        if self.api_cache:
+            logger.info(f"reusing Youtube API results from {self.api_cache}")
+        else:
+            logger.info("testing Youtube credentials")
+            if not credentials_ok():
+                raise ValueError(
+                    "Unable to connect to Youtube API v3. check `API_KEY`."
+                )
 
         if self.s3_url_with_credentials and not self.s3_credentials_ok():
             raise ValueError("Unable to connect to Optimization Cache. Check its URL.")
@@ -260,6 +405,9 @@ class Youtube2Zim(object):
         # fail early if supplied branding files are missing
         self.check_branding_values()
 
+    def retrieve_collection(self):
+        """ API phase: compute playlists and videos to include """
+
         logger.info("compute playlists list to retrieve")
         self.extract_playlists()
 
@@ -280,26 +428,52 @@ class Youtube2Zim(object):
             )
         logger.info(f"{nb_videos_msg}.")
 
-        # download videos (and recompress)
+        if self.shard_by:
+            logger.info(f"compute shards by {self.shard_by}")
+            self.compute_shards()
+
+        if self.previous_zim:
+            logger.info(f"reusing media from previous ZIM at {self.previous_zim}")
+            self.reuse_previous_zim()
+
+    def download_media(self):
+        """ download (and recompress) videos_ids' media. returns succeeded, failed """
+
         logger.info(
             f"downloading all videos, subtitles and thumbnails (concurrency={self.max_concurrency})"
         )
         logger.info(f"  format: {self.video_format}")
         logger.info(f"  quality: {self.video_quality}")
+        logger.info(f"  audio-only: {self.audio_only}")
+        if self.extra_renditions:
+            logger.info(
+                f"  extra renditions: {', '.join(r.name for r in self.extra_renditions)}"
+            )
         logger.info(f"  generated-subtitles: {self.all_subtitles}")
+        if self.subtitles_langs or self.subtitles_max is not None:
+            logger.info(
+                f"  subtitles-langs: {','.join(self.subtitles_langs) or 'any'} "
+                f"(max: {self.subtitles_max})"
+            )
+        if self.local_cache:
+            logger.info(f"  using local cache: {self.local_cache.root}")
         if self.s3_storage:
             logger.info(
                 f"  using cache: {self.s3_storage.url.netloc} with bucket: {self.s3_storage.bucket_name}"
             )
-        succeeded, failed = self.download_video_files(
-            max_concurrency=self.max_concurrency
-        )
+            self.prefetch_from_cache()
+        return self.download_video_files(max_concurrency=self.max_concurrency)
+
+    def check_downloads(self, succeeded, failed):
         if failed:
             logger.error(f"{len(failed)} video(s) failed to download: {failed}")
             if len(failed) >= len(succeeded):
                 logger.critical("More than half of videos failed. exiting")
                 raise IOError("Too much videos failed to download")
 
+    def build(self, succeeded):
+        """ make HTML files and ZIM(s) out of succeeded videos """
+
         logger.info("retrieve channel-info for all videos (author details)")
         get_videos_authors_info(succeeded)
 
@@ -309,39 +483,227 @@ class Youtube2Zim(object):
         logger.info("update general metadata")
         self.update_metadata()
 
-        logger.info("creating HTML files")
-        self.make_html_files(succeeded)
-
-        # make zim file
         os.makedirs(self.output_dir, exist_ok=True)
-        if not self.no_zim:
-            period = datetime.datetime.now().strftime("%Y-%m")
-            self.fname = (
-                self.fname.format(period=period)
-                if self.fname
-                else f"{self.name}_{period}.zim"
-            )
-            logger.info("building ZIM file")
-            make_zim_file(
-                build_dir=self.build_dir,
-                fpath=self.output_dir / self.fname,
-                name=self.name,
-                main_page="home.html",
-                favicon="favicon.jpg",
-                title=self.title,
-                description=self.description,
-                language=self.language,
-                creator=self.creator,
-                publisher="Kiwix",
-                tags=self.tags,
-                scraper=SCRAPER,
-            )
-
-            if not self.keep_build_dir:
-                logger.info("removing temp folder")
-                shutil.rmtree(self.build_dir, ignore_errors=True)
+        period = datetime.datetime.now().strftime("%Y-%m")
+        self.fname = (
+            self.fname.format(period=period)
+            if self.fname
+            else f"{self.name}_{period}.zim"
+        )
 
-        logger.info("all done!")
+        for shard in self.shards:
+            logger.info(f"creating shard {shard[0]}")
+            self.make_shard(*shard, actual_videos_ids=succeeded)
+
+        if not self.shard_by:
+            logger.info("creating HTML files")
+            self.make_html_files(succeeded)
+
+            # make zim file
+            if not self.no_zim:
+                logger.info("building ZIM file")
+                self.make_zim_file()
+
+        for rendition in self.extra_renditions:
+            logger.info(f"creating {rendition.name} rendition")
+            self.make_rendition(rendition, succeeded)
+
+    def cleanup(self):
+        if not self.no_zim and not self.keep_build_dir:
+            logger.info("removing temp folder")
+            shutil.rmtree(self.build_dir, ignore_errors=True)
+            shutil.rmtree(self.renditions_dir, ignore_errors=True)
+            shutil.rmtree(self.shards_dir, ignore_errors=True)
+            shutil.rmtree(self.subtitles_indexes_dir, ignore_errors=True)
+
+    @property
+    def main_page(self):
+        """ first static listing page if any (faster to display) or home """
+        if self.static_listings and self.playlists:
+            return f"playlist_{self.playlists[0].slug}_1.html"
+        return "home.html"
+
+    def make_zim_file(self):
+        make_zim_file(
+            build_dir=self.build_dir,
+            fpath=self.output_dir / self.fname,
+            name=self.name,
+            main_page=self.main_page,
+            favicon="favicon.jpg",
+            title=self.title,
+            description=self.description,
+            language=self.language,
+            creator=self.creator,
+            publisher="Kiwix",
+            tags=self.tags,
+            scraper=SCRAPER,
+        )
+
+    @contextlib.contextmanager
+    def overriding(self, **attributes):
+        """ temporarily set attributes (to build variants of the main build) """
+        original = {key: getattr(self, key) for key in attributes}
+        for key, value in attributes.items():
+            setattr(self, key, value)
+        try:
+            yield
+        finally:
+            for key, value in original.items():
+                setattr(self, key, value)
+
+    def clone_build_dir(self, dst_dir, with_video_files=True, videos_ids=None):
+        """copy of build_dir content into dst_dir (only videos_ids' if set)
+
+        Media (videos and channels) are hardlinked while other (generated) files
+        are copied so they can be safely rewritten"""
+
+        main_video = f"video.{self.video_format}"
+        videos_ids = set(videos_ids) if videos_ids is not None else None
+        for src in self.build_dir.rglob("*"):
+            if src.is_dir():
+                continue
+            is_video = self.videos_dir in src.parents
+            is_media = is_video or self.channels_dir in src.parents
+            if not with_video_files and is_media and src.name == main_video:
+                continue
+            if (
+                is_video
+                and videos_ids is not None
+                and src.relative_to(self.videos_dir).parts[0] not in videos_ids
+            ):
+                continue
+            dst = dst_dir.joinpath(src.relative_to(self.build_dir))
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            if is_media:
+                link_or_copy(src, dst)
+            else:
+                shutil.copy2(src, dst)
+
+    def make_rendition(self, rendition, actual_videos_ids):
+        """ build folder and ZIM for an extra rendition, from main build folder """
+
+        # rendition's video files are already in place
+        rendition_dir = self.renditions_dir.joinpath(rendition.name)
+        self.clone_build_dir(rendition_dir, with_video_files=False)
+
+        with self.overriding(
+            build_dir=rendition_dir,
+            video_format=rendition.video_format,
+            low_quality=rendition.low_quality,
+            video_quality=rendition.quality,
+            name=f"{self.name}_{rendition.name}",
+            fname=f"{Path(self.fname).stem}_{rendition.name}.zim"
+            if self.fname
+            else None,
+        ):
+            self.make_html_files(actual_videos_ids)
+            if not self.no_zim:
+                logger.info(f"building {rendition.name} ZIM file")
+                self.make_zim_file()
+
+    def get_playlist_videos_ids(self, playlist):
+        videos = load_json(self.cache_dir, f"playlist_{playlist.playlist_id}_videos")
+        return [video["contentDetails"]["videoId"] for video in videos]
+
+    def compute_shards(self):
+        """split videos into shards according to --shard-by
+
+        Videos are sorted by publication date so that, as the collection grows,
+        existing year or size shards remain the same and new ones are added.
+        With --only-shard, other shards are dropped and their videos ignored"""
+
+        videos = load_json(self.cache_dir, "videos")
+        videos_ids = sorted(
+            self.videos_ids,
+            key=lambda video_id: videos[video_id]["contentDetails"].get(
+                "videoPublishedAt", ""
+            ),
+        )
+
+        shards = []  # (label, title, videos_ids). title defaults to suffixed one
+        if self.shard_by == "playlist":
+            selected = set(videos_ids)
+            for playlist in self.playlists:
+                if playlist.playlist_id == self.uploads_playlist_id:
+                    continue  # all videos of the channel
+                shards.append(
+                    (
+                        playlist.slug,
+                        playlist.title,
+                        [
+                            video_id
+                            for video_id in self.get_playlist_videos_ids(playlist)
+                            if video_id in selected
+                        ],
+                    )
+                )
+        elif self.shard_by == "year":
+            for video_id in videos_ids:
+                year = videos[video_id]["contentDetails"].get("videoPublishedAt", "")
+                year = year[:4] or "unknown"
+                if not shards or shards[-1][0] != year:
+                    shards.append((year, None, []))
+                shards[-1][2].append(video_id)
+        else:
+            durations = get_videos_durations(videos_ids)
+            # kbps to bytes per second. ~100KB per video for thumbnail, HTML...
+            rate = self.main_rendition.estimated_bitrate * 1000 / 8
+            shard_size = 0
+            for video_id in videos_ids:
+                size = durations.get(video_id, 0) * rate + 100 * 2 ** 10
+                if not shards or shard_size + size > self.shard_max_size:
+                    shards.append((f"part{len(shards) + 1}", None, []))
+                    shard_size = 0
+                shards[-1][2].append(video_id)
+                shard_size += size
+
+        if self.only_shard:
+            shards = [shard for shard in shards if shard[0] == self.only_shard]
+            if not shards:
+                raise ValueError(f"No shard `{self.only_shard}` by {self.shard_by}")
+            selected = set(shards[0][2])
+            self.videos_ids = [
+                video_id for video_id in self.videos_ids if video_id in selected
+            ]
+
+        # home of each shard only lists playlists with videos in it
+        self.shards = []
+        for label, title, shard_videos_ids in shards:
+            selected = set(shard_videos_ids)
+            playlists = [
+                playlist
+                for playlist in self.playlists
+                if selected & set(self.get_playlist_videos_ids(playlist))
+                and (self.shard_by != "playlist" or playlist.slug == label)
+            ]
+            self.shards.append((label, title, shard_videos_ids, playlists))
+        logger.info(
+            ".. {} shards: {}".format(
+                len(self.shards),
+                ", ".join(f"{shard[0]} ({len(shard[2])})" for shard in self.shards),
+            )
+        )
+
+    def make_shard(self, label, title, videos_ids, playlists, actual_videos_ids):
+        """ build folder and ZIM for a shard, from main build folder """
+
+        shard_dir = self.shards_dir.joinpath(label)
+        self.clone_build_dir(shard_dir, videos_ids=videos_ids)
+        selected = set(videos_ids)
+
+        with self.overriding(
+            build_dir=shard_dir,
+            playlists=playlists,
+            title=title or f"{self.title} ({label})",
+            name=f"{self.name}_{label}",
+            fname=f"{Path(self.fname).stem}_{label}.zim",
+        ):
+            self.make_html_files(
+                [video_id for video_id in actual_videos_ids if video_id in selected]
+            )
+            if not self.no_zim:
+                logger.info(f"building {label} ZIM file")
+                self.make_zim_file()
 
     def s3_credentials_ok(self):
         logger.info("testing S3 Optimization Cache credentials")
@@ -377,6 +739,9 @@ class Youtube2Zim(object):
 
         # cache folder to store youtube-api results
         self.cache_dir.mkdir(exist_ok=True)
+        if self.api_cache:
+            for key, result in load_api_cache(self.api_cache).items():
+                save_json(self.cache_dir, key, result)
 
         # make videos placeholder
         self.videos_dir.mkdir(exist_ok=True)
@@ -467,13 +832,17 @@ class Youtube2Zim(object):
                 )
             save_json(self.cache_dir, "videos", all_videos)
         self.videos_ids = [*all_videos.keys()]  # unpacking so it's subscriptable
+        self.thumbnails_urls = {
+            video_id: [
+                video["snippet"]["thumbnails"][quality]["url"]
+                for quality in THUMBNAILS_QUALITIES
+                if quality in video["snippet"].get("thumbnails", {})
+            ]
+            for video_id, video in all_videos.items()
+        }
 
     def download_video_files(self, max_concurrency):
 
-        audext, vidext = {"webm": ("webm", "webm"), "mp4": ("m4a", "mp4")}[
-            self.video_format
-        ]
-
         # prepare options which are shared with every downloader
         options = {
             "cachedir": self.videos_dir,
@@ -491,7 +860,12 @@ class Youtube2Zim(object):
             # "external_downloader_args": ["--max-tries=20", "--retry-wait=30"],
             "outtmpl": str(self.videos_dir.joinpath("%(id)s", "video.%(ext)s")),
             "preferredcodec": self.video_format,
-            "format": f"best[ext={vidext}]/bestvideo[ext={vidext}]+bestaudio[ext={audext}]/best",
+            "format": get_format_selector(
+                self.source_rendition.video_format,
+                self.source_rendition.preset,
+                self.source_rendition.low_quality,
+                self.audio_only,
+            ),
             "y2z_videos_dir": self.videos_dir,
         }
         if self.all_subtitles:
@@ -501,9 +875,20 @@ class Youtube2Zim(object):
         nb_videos = len(self.videos_ids)
         concurrency = nb_videos if nb_videos < max_concurrency else max_concurrency
 
+        if self.s3_storage:
+            self.upload_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.cache_transfers
+            )
+
         # short-circuit concurency if we have only one thread (can help debug)
         if concurrency <= 1:
-            return self.download_video_files_batch(options, self.videos_ids)
+            succeeded, failed = self.download_video_files_batch(
+                options, self.videos_ids
+            )
+            self.wait_for_uploads()
+            if self.local_cache:
+                self.local_cache.evict()
+            return succeeded, failed
 
         # prepare out videos_ids batches
         def get_slot():
@@ -548,6 +933,10 @@ class Youtube2Zim(object):
                 overall_succeeded += succeeded
                 overall_failed += failed
 
+        self.wait_for_uploads()
+        if self.local_cache:
+            self.local_cache.evict()
+
         # remove left-over files for failed downloads
         logger.debug(f"removing left-over files of {len(overall_failed)} failed videos")
         for video_id in overall_failed:
@@ -555,8 +944,151 @@ class Youtube2Zim(object):
 
         return overall_succeeded, overall_failed
 
+    @property
+    def cache_transfers(self):
+        """ number of parallel optimization-cache requests/transfers """
+        return max(8, self.max_concurrency * 2)
+
+    @property
+    def s3_transfer_config(self):
+        """ multipart settings for optimization-cache transfers """
+        return TransferConfig(
+            multipart_threshold=8 * 2 ** 20,
+            multipart_chunksize=8 * 2 ** 20,
+            max_concurrency=10,
+        )
+
+    def get_cache_entries(self, video_id):
+        """ list of (key, path, version) expected from cache for a video """
+        return [
+            (self.video_cache_key(rendition, video_id), path, rendition.preset.VERSION)
+            for path, rendition in self.get_video_outputs(video_id)
+        ] + [
+            (
+                f"thumbnails/high/{video_id}",
+                self.videos_dir.joinpath(video_id, "video.webp"),
+                WebpHigh.VERSION,
+            ),
+            (
+                self.subtitles_index_key(video_id),
+                self.get_subtitles_index_path(video_id),
+                SUBTITLES_CACHE_VERSION,
+            ),
+        ]
+
+    def prefetch_from_cache(self):
+        """check and download all cached files at once, before any youtube work
+
+        Keys are checked via parallel HEAD requests (listing shared prefixes of
+        the bucket would cost more) then hits are downloaded in parallel.
+        Subtitles tracks are listed in their index so are fetched next"""
+
+        self.prefetch_entries(
+            [
+                entry
+                for video_id in self.videos_ids
+                if video_id not in self.reused_videos
+                for entry in self.get_cache_entries(video_id)
+            ]
+        )
+        self.prefetch_entries(
+            [
+                entry
+                for video_id in self.videos_ids
+                if self.subtitles_index_key(video_id) in self.cache_prefetched
+                for entry in self.get_subtitles_cache_entries(video_id)
+            ]
+        )
+
+    def prefetch_entries(self, entries):
+        """ check and download (key, path, version) entries from cache """
+
+        # no need to check S3 for what's already in local cache
+        local_hits = {
+            key
+            for key, path, encoder_version in entries
+            if self.download_from_local_cache(key, path, encoder_version)
+        }
+        entries = [entry for entry in entries if entry[0] not in local_hits]
+        logger.info(f"checking {len(entries)} files in optimization cache")
+
+        def is_cached(entry):
+            key, _, encoder_version = entry
+            try:
+                if self.use_any_optimized_version:
+                    return self.s3_storage.has_object(key, self.s3_storage.bucket_name)
+                return self.s3_storage.has_object_matching_meta(
+                    key, tag="encoder_version", value=f"v{encoder_version}"
+                )
+            except Exception as exc:
+                logger.debug(f"{key} could not be checked in cache: {exc}")
+                return False
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.cache_transfers
+        ) as executor:
+            hits = [
+                entry
+                for entry, cached in zip(entries, executor.map(is_cached, entries))
+                if cached
+            ]
+        self.cache_missing |= {entry[0] for entry in entries} - {
+            entry[0] for entry in hits
+        }
+
+        logger.info(f".. downloading {len(hits)} files from optimization cache")
+
+        def prefetch(entry):
+            key, path, encoder_version = entry
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                self.s3_storage.download_file(key, path, Config=self.s3_transfer_config)
+            except Exception as exc:
+                logger.error(f"{key} failed to download from cache: {exc}")
+                return None
+            self.add_to_local_cache(key, path, encoder_version)
+            return key
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.cache_transfers
+        ) as executor:
+            self.cache_prefetched |= local_hits | set(
+                filter(None, executor.map(prefetch, hits))
+            )
+
+    @property
+    def has_cache(self):
+        return bool(self.s3_storage or self.local_cache)
+
+    def download_from_local_cache(self, key, video_path, encoder_version):
+        """ whether it successfully retrieved from local cache """
+        if not self.local_cache:
+            return False
+        if not self.local_cache.get(
+            key,
+            video_path,
+            None if self.use_any_optimized_version else encoder_version,
+        ):
+            return False
+        logger.debug(f"retrieved {video_path} from local cache at {key}")
+        return True
+
+    def add_to_local_cache(self, key, video_path, encoder_version):
+        # version of S3 objects is unknown when using any optimized version
+        if self.local_cache and not self.use_any_optimized_version:
+            self.local_cache.put(key, video_path, encoder_version)
+
     def download_from_cache(self, key, video_path, encoder_version):
-        """ whether it successfully downloaded from cache """
+        """ whether it successfully downloaded from (local then S3) cache """
+        if key in self.cache_prefetched:
+            logger.debug(f"{video_path} already prefetched from cache at {key}")
+            return True
+        if key in self.cache_missing:
+            return False
+        if self.download_from_local_cache(key, video_path, encoder_version):
+            return True
+        if not self.s3_storage:
+            return False
         if self.use_any_optimized_version:
             if not self.s3_storage.has_object(key, self.s3_storage.bucket_name):
                 return False
@@ -567,18 +1099,28 @@ class Youtube2Zim(object):
                 return False
         video_path.parent.mkdir(parents=True, exist_ok=True)
         try:
-            self.s3_storage.download_file(key, video_path)
+            self.s3_storage.download_file(
+                key, video_path, Config=self.s3_transfer_config
+            )
         except Exception as exc:
             logger.error(f"{key} failed to download from cache: {exc}")
             return False
         logger.info(f"downloaded {video_path} from cache at {key}")
+        self.add_to_local_cache(key, video_path, encoder_version)
         return True
 
     def upload_to_cache(self, key, video_path, encoder_version):
-        """ whether it successfully uploaded to cache """
+        """ whether it successfully uploaded to (local and S3) cache """
+        if self.local_cache:
+            self.local_cache.put(key, video_path, encoder_version)
+        if not self.s3_storage:
+            return True
         try:
             self.s3_storage.upload_file(
-                video_path, key, meta={"encoder_version": f"v{encoder_version}"}
+                video_path,
+                key,
+                meta={"encoder_version": f"v{encoder_version}"},
+                Config=self.s3_transfer_config,
             )
         except Exception as exc:
             logger.error(f"{key} failed to upload to cache: {exc}")
@@ -586,20 +1128,108 @@ class Youtube2Zim(object):
         logger.info(f"uploaded {video_path} to cache at {key}")
         return True
 
+    def schedule_upload_to_cache(self, key, video_path, encoder_version):
+        """ upload to cache in background so workers don't wait for it """
+        if not self.upload_executor:
+            return self.upload_to_cache(key, video_path, encoder_version)
+        self.cache_uploads.append(
+            self.upload_executor.submit(
+                self.upload_to_cache, key, video_path, encoder_version
+            )
+        )
+
+    def wait_for_uploads(self):
+        """ wait for scheduled background uploads to complete """
+        if not self.upload_executor:
+            return
+        if self.cache_uploads:
+            logger.info(f"waiting for {len(self.cache_uploads)} uploads to cache")
+        self.upload_executor.shutdown(wait=True)
+        self.upload_executor = None
+        self.cache_uploads = []
+
+    @staticmethod
+    def video_cache_key(rendition, video_id):
+        return f"{rendition.cache_folder}/{video_id}"
+
+    def get_video_outputs(self, video_id):
+        """ list of (path, rendition) to produce for a video, main one first """
+        # extra renditions are encoded from the same download
+        return [
+            (
+                self.videos_dir.joinpath(video_id, f"video.{self.video_format}"),
+                self.main_rendition,
+            )
+        ] + [
+            (
+                self.renditions_dir.joinpath(
+                    rendition.name,
+                    "videos",
+                    video_id,
+                    f"video.{rendition.video_format}",
+                ),
+                rendition,
+            )
+            for rendition in self.extra_renditions
+        ]
+
+    def reuse_previous_zim(self):
+        """ extract media of current videos from previous ZIM, if compatible """
+        if self.extra_renditions:
+            logger.warning(".. not reusable with --extra-renditions")
+            return
+
+        previous_zim = PreviousZim(self.previous_zim)
+        if not previous_zim.matches(
+            video_format=self.video_format,
+            video_quality=self.video_quality,
+            audio_only=self.audio_only,
+        ):
+            logger.warning(
+                f".. not reusable: built with other options {previous_zim.metadata}"
+            )
+            return
+        with_subtitles = previous_zim.matches(subtitles=self.subtitles_selection)
+
+        for video_id in self.videos_ids:
+            if previous_zim.extract_video(
+                video_id,
+                self.videos_dir.joinpath(video_id),
+                self.video_format,
+                with_subtitles=with_subtitles,
+            ):
+                self.reused_videos.add(video_id)
+        if with_subtitles:
+            self.reused_subtitles = set(self.reused_videos)
+        logger.info(
+            f".. reused {len(self.reused_videos)} videos "
+            f"({'with' if with_subtitles else 'without'} subtitles)"
+        )
+
     def download_video(self, video_id, options):
         """ download the video from cache/youtube and return True if successful """
 
-        preset = {"mp4": VideoMp4Low}.get(self.video_format, VideoWebmLow)()
+        if video_id in self.reused_videos:
+            return True
+
+        preset = self.video_preset
         options_copy = options.copy()
         video_location = options_copy["y2z_videos_dir"].joinpath(video_id)
-        video_path = video_location.joinpath(f"video.{self.video_format}")
+        outputs = self.get_video_outputs(video_id)
+        renditions = outputs[1:]
 
-        if self.s3_storage:
-            s3_key = f"{self.video_format}/{self.video_quality}/{video_id}"
+        if self.has_cache:
             logger.debug(
                 f"Attempting to download video file for {video_id} from cache..."
             )
-            if self.download_from_cache(s3_key, video_path, preset.VERSION):
+            if all(
+                self.download_from_cache(
+                    self.video_cache_key(rendition, video_id),
+                    path,
+                    rendition.preset.VERSION,
+                )
+                for path, rendition in outputs
+            ):
                 return True
 
         try:
@@ -613,13 +1243,22 @@ class Youtube2Zim(object):
                 }
             )
             with youtube_dl.YoutubeDL(options_copy) as ydl:
-                ydl.download([video_id])
+                if self.fused_transcode and self.source_rendition.low_quality:
+                    streams = self.download_video_streams(ydl, video_id)
+                else:
+                    ydl.download([video_id])
+                    streams = None
             post_process_video(
                 video_location,
                 video_id,
                 preset,
                 self.video_format,
                 self.low_quality,
+                streams=streams,
+                chunked_above=self.chunked_encode_above,
+                encode_workers=self.encode_workers,
+                renditions=renditions,
+                audio_only=self.audio_only,
             )
         except (
             youtube_dl.utils.DownloadError,
@@ -630,20 +1269,55 @@ class Youtube2Zim(object):
             logger.debug(exc)
             return False
         else:  # upload to cache only if everything went well
-            if self.s3_storage:
+            if self.has_cache:
                 logger.debug(f"Uploading video file for {video_id} to cache ...")
-                self.upload_to_cache(s3_key, video_path, preset.VERSION)
+                for path, rendition in outputs:
+                    self.schedule_upload_to_cache(
+                        self.video_cache_key(rendition, video_id),
+                        path,
+                        rendition.preset.VERSION,
+                    )
             return True
 
+    def download_video_streams(self, ydl, video_id):
+        """download video without letting youtube_dl merge separate streams
+
+        returns (video_path, audio_path) for separate streams or None if
+        a single file was downloaded (regular post-processing applies)"""
+
+        info = ydl.extract_info(video_id, download=False)
+        if not info.get("requested_formats"):
+            ydl.process_info(info)
+            return None
+
+        streams = {}
+        for fmt in info["requested_formats"]:
+            stream_info = dict(info)
+            stream_info.update(fmt)
+            stream_path = Path(ydl.prepare_filename(stream_info)).with_suffix(
+                f".f{fmt['format_id']}.{fmt['ext']}"
+            )
+            downloader = get_suitable_downloader(stream_info, ydl.params)
+            if not downloader(ydl, ydl.params).download(str(stream_path), stream_info):
+                raise youtube_dl.utils.DownloadError(
+                    f"Unable to download format {fmt['format_id']} of {video_id}"
+                )
+            kind = "audio" if fmt.get("vcodec") == "none" else "video"
+            streams[kind] = stream_path
+        return streams["video"], streams["audio"]
+
     def download_thumbnail(self, video_id, options):
         """ download the thumbnail from cache/youtube and return True if successful """
 
+        if video_id in self.reused_videos:
+            return True
+
         preset = WebpHigh()
         options_copy = options.copy()
         video_location = options_copy["y2z_videos_dir"].joinpath(video_id)
         thumbnail_path = video_location.joinpath("video.webp")
 
-        if self.s3_storage:
+        if self.has_cache:
             s3_key = f"thumbnails/high/{video_id}"
             logger.debug(
                 f"Attempting to download thumbnail for {video_id} from cache..."
@@ -652,17 +1326,18 @@ class Youtube2Zim(object):
                 return True
 
         try:
-            # skip downloading the video
-            options_copy.update(
-                {
-                    "skip_download": True,
-                    "writesubtitles": False,
-                    "allsubtitles": False,
-                    "writeautomaticsub": False,
-                }
-            )
-            with youtube_dl.YoutubeDL(options_copy) as ydl:
-                ydl.download([video_id])
+            if not self.fetch_thumbnail(video_id, thumbnail_path.with_suffix(".jpg")):
+                # skip downloading the video
+                options_copy.update(
+                    {
+                        "skip_download": True,
+                        "writesubtitles": False,
+                        "allsubtitles": False,
+                        "writeautomaticsub": False,
+                    }
+                )
+                with youtube_dl.YoutubeDL(options_copy) as ydl:
+                    ydl.download([video_id])
             process_thumbnail(thumbnail_path, preset)
         except (
             youtube_dl.utils.DownloadError,
@@ -673,21 +1348,168 @@ class Youtube2Zim(object):
             logger.debug(exc)
             return False
         else:  # upload to cache only if everything went well
-            if self.s3_storage:
+            if self.has_cache:
                 logger.debug(f"Uploading thumbnail for {video_id} to cache ...")
-                self.upload_to_cache(s3_key, thumbnail_path, preset.VERSION)
+                self.schedule_upload_to_cache(s3_key, thumbnail_path, preset.VERSION)
             return True
 
+    def fetch_thumbnail(self, video_id, thumbnail_path):
+        """whether thumbnail could be fetched from its API-listed URLs
+
+        Much faster than a youtube_dl extraction. URLs are tried by quality"""
+        for url in self.thumbnails_urls.get(video_id, []):
+            try:
+                resp = self.youtube_store.session.get(url, timeout=30)
+                resp.raise_for_status()
+            except requests.RequestException as exc:
+                logger.debug(f"Unable to fetch thumbnail {url} for {video_id}: {exc}")
+                continue
+            thumbnail_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(thumbnail_path, "wb") as fh:
+                fh.write(resp.content)
+            return True
+        return False
+
+    @property
+    def subtitles_selection(self):
+        """ subtitles options as a cache key part (tracks depend on those) """
+        parts = ["generated" if self.all_subtitles else "uploaded"]
+        if self.subtitles_langs:
+            parts.append("+".join(self.subtitles_langs))
+        if self.subtitles_max is not None:
+            parts.append(f"max{self.subtitles_max}")
+        return "_".join(parts)
+
+    def subtitles_cache_key(self, video_id, name):
+        return f"subtitles/{self.subtitles_selection}/{video_id}/{name}"
+
+    def subtitles_index_key(self, video_id):
+        """ dated so that tracks added to video since are eventually fetched """
+        return self.subtitles_cache_key(video_id, f"index_{self.subtitles_period}")
+
+    def get_subtitles_index_path(self, video_id):
+        """ JSON list of video's subtitles languages (cached alongside tracks) """
+        return self.subtitles_indexes_dir.joinpath(f"{video_id}.json")
+
+    def download_subtitles_from_cache(self, video_id):
+        """ whether index and all subtitles tracks were retrieved from cache """
+        index_path = self.get_subtitles_index_path(video_id)
+        if not self.download_from_cache(
+            self.subtitles_index_key(video_id),
+            index_path,
+            SUBTITLES_CACHE_VERSION,
+        ):
+            return False
+        if load_json(index_path.parent, video_id) is None:
+            return False
+        tracks = self.get_subtitles_cache_entries(video_id)
+        if all(self.download_from_cache(*entry) for entry in tracks):
+            return True
+        # partial hit: restored files may be linked to local cache entries and
+        # must not be rewritten in place by youtube_dl
+        for path in [entry[1] for entry in tracks] + [index_path]:
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
+        return False
+
+    def get_subtitles_cache_entries(self, video_id):
+        """ list of (key, path, version) of tracks in video's (retrieved) index """
+        video_dir = self.videos_dir.joinpath(video_id)
+        return [
+            (
+                self.subtitles_cache_key(video_id, lang),
+                video_dir.joinpath(f"video.{lang}.vtt"),
+                SUBTITLES_CACHE_VERSION,
+            )
+            for lang in load_json(self.subtitles_indexes_dir, video_id) or []
+        ]
+
+    def upload_subtitles_to_cache(self, video_id, languages):
+        """ schedule upload of video's subtitles tracks and index to cache """
+        index_path = self.get_subtitles_index_path(video_id)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        # may be linked to a local cache entry: replace rather than rewrite
+        with contextlib.suppress(FileNotFoundError):
+            index_path.unlink()
+        save_json(index_path.parent, video_id, languages)
+        for entry in self.get_subtitles_cache_entries(video_id):
+            self.schedule_upload_to_cache(*entry)
+        self.schedule_upload_to_cache(
+            self.subtitles_index_key(video_id),
+            index_path,
+            SUBTITLES_CACHE_VERSION,
+        )
+
     def download_subtitles(self, video_id, options):
-        """ download subtitles for a video """
+        """ download subtitles for a video (from cache if possible) """
+
+        if video_id in self.reused_subtitles:
+            return
+
+        if self.has_cache:
+            logger.debug(f"Attempting to download subtitles for {video_id} from cache")
+            if self.download_subtitles_from_cache(video_id):
+                return
 
         options_copy = options.copy()
         options_copy.update({"skip_download": True, "writethumbnail": False})
         try:
             with youtube_dl.YoutubeDL(options_copy) as ydl:
-                ydl.download([video_id])
+                # single extraction: pick languages from available tracks
+                info = ydl.extract_info(video_id, download=False, process=False)
+                languages = self.select_subtitles_languages(info)
+                # youtube_dl takes empty subtitleslangs as unset (en/first)
+                if languages:
+                    ydl.params.update(
+                        {"allsubtitles": False, "subtitleslangs": languages}
+                    )
+                    ydl.process_ie_result(info, download=True)
         except Exception:
             logger.error(f"Could not download subtitles for {video_id}")
+            return
+
+        # youtube_dl only warns about tracks it failed to download
+        video_dir = self.videos_dir.joinpath(video_id)
+        missing = [
+            lang
+            for lang in languages
+            if not video_dir.joinpath(f"video.{lang}.vtt").exists()
+        ]
+        if missing:
+            logger.warning(
+                f"Could not download subtitles {','.join(missing)} for {video_id}"
+            )
+        elif self.has_cache:  # upload to cache only if everything went well
+            self.upload_subtitles_to_cache(video_id, languages)
+
+    def select_subtitles_languages(self, info):
+        """languages to download from available tracks, per --subtitles-langs
+
+        Tracks uploaded by author (`original`) are preferred over generated ones
+        (only with --all-subtitles). --subtitles-max caps the number of tracks
+        not from `original` so `original,en,fr` with max 1 is original+1"""
+
+        uploaded = list(info.get("subtitles") or {})
+        generated = (
+            list(info.get("automatic_captions") or {}) if self.all_subtitles else []
+        )
+
+        original, selected = [], []
+        # None: all tracks, when no --subtitles-langs
+        for lang in self.subtitles_langs or [None]:
+            if lang == "original":
+                original += [code for code in uploaded if code not in original]
+                continue
+            if lang is None:
+                candidates = uploaded + generated
+            else:
+                candidates = [lang] if lang in uploaded or lang in generated else []
+            selected += [code for code in candidates if code not in selected]
+
+        selected = [code for code in selected if code not in original]
+        if self.subtitles_max is not None:
+            selected = selected[: self.subtitles_max]
+        return original + selected
 
     def download_video_files_batch(self, options, videos_ids):
         """ download video file and thumbnail for all videos in batch and return succeeded and failed video ids """
@@ -753,7 +1575,7 @@ class Youtube2Zim(object):
         self.publisher = self.publisher or "Kiwix"
 
         self.tags = self.tags or ["youtube"]
-        if "_videos:yes" not in self.tags:
+        if "_videos:yes" not in self.tags and not self.audio_only:
             self.tags.append("_videos:yes")
 
         # copy our main_channel branding into /(profile|banner).jpg if not supplied
@@ -786,6 +1608,7 @@ class Youtube2Zim(object):
         """make up HTML structure to read the content
 
         /home.html                                  Homepage
+        /playlist_<slug>_<page>.html                static listing pages (option)
 
         for each video:
             - <slug-title>.html                     HTML article
@@ -794,8 +1617,10 @@ class Youtube2Zim(object):
             - videos/<videoId>/video.webp            template
         """
 
+        actual_videos_ids = set(actual_videos_ids)
+
         def remove_unused_videos(videos):
-            video_ids = [video["contentDetails"]["videoId"] for video in videos]
+            video_ids = {video["contentDetails"]["videoId"] for video in videos}
             for path in self.videos_dir.iterdir():
                 if path.is_dir() and path.name not in video_ids:
                     logger.debug(f"Removing unused video {path.name}")
@@ -808,25 +1633,35 @@ class Youtube2Zim(object):
         def video_has_channel(videos_channels, video):
             return video["contentDetails"]["videoId"] in videos_channels
 
-        def get_subtitles(video_id):
-            video_dir = self.videos_dir.joinpath(video_id)
-            languages = [
-                x.stem.split(".")[1]
-                for x in video_dir.iterdir()
-                if x.is_file() and x.name.endswith(".vtt")
-            ]
+        @functools.lru_cache(maxsize=None)
+        def to_jinja_subtitle(lang):
+            subtitle = get_language_details(YOUTUBE_LANG_MAP.get(lang, lang))
+            return {
+                "code": lang,
+                # Youtube.com uses `English - code` format.
+                # Note: videojs displays it lowercased anyway
+                "name": f"{subtitle['english'].title()} - {subtitle['query']}",
+            }
 
-            def to_jinja_subtitle(lang):
-                subtitle = get_language_details(YOUTUBE_LANG_MAP.get(lang, lang))
-                return {
-                    "code": lang,
-                    # Youtube.com uses `English - code` format.
-                    # Note: videojs displays it lowercased anyway
-                    "name": f"{subtitle['english'].title()} - {subtitle['query']}",
-                }
+        # single scan of all subtitles files: {video_id: [lang, ...]}
+        languages_index = {}
+        for path in self.videos_dir.glob("*/*.vtt"):
+            if path.is_file():
+                languages_index.setdefault(path.parent.name, []).append(
+                    path.stem.split(".")[1]
+                )
+        # Youtube.com sorts subtitles by English name
+        subtitles_index = {
+            video_id: sorted(map(to_jinja_subtitle, languages), key=lambda x: x["name"])
+            for video_id, languages in languages_index.items()
+        }
+
+        def get_subtitles(video_id):
+            return subtitles_index.get(video_id, [])
 
-            # Youtube.com sorts subtitles by English name
-            return sorted(map(to_jinja_subtitle, languages), key=lambda x: x["name"])
+        @functools.lru_cache(maxsize=None)
+        def format_day(day):
+            return format_date(day, format="medium", locale=self.locale)
 
         env = jinja2.Environment(
             loader=jinja2.FileSystemLoader(str(self.templates_dir)), autoescape=True
@@ -839,47 +1674,58 @@ class Youtube2Zim(object):
         has_channel = functools.partial(video_has_channel, videos_channels)
         # filter videos to exclude those for which we have no channel (#76)
         videos = list(filter(has_channel, videos))
+        articles = []
         for video in videos:
             video_id = video["contentDetails"]["videoId"]
             title = video["snippet"]["title"]
-            slug = get_slug(title)
-            description = video["snippet"]["description"]
             publication_date = dt_parser.parse(
                 video["contentDetails"]["videoPublishedAt"]
             )
-            author = videos_channels[video_id]
-            subtitles = get_subtitles(video_id)
-            video_url = f"https://www.youtube.com/watch?v={video_id}"
-
-            html = env.get_template("article.html").render(
-                video_id=video_id,
-                video_format=self.video_format,
-                author=author,
-                title=title,
-                description=description,
-                date=format_date(publication_date, format="medium", locale=self.locale),
-                subtitles=subtitles,
-                url=video_url,
-                channel_id=video["snippet"]["channelId"],
-                color=self.main_color,
-                background_color=self.secondary_color,
-                autoplay=self.autoplay,
+            articles.append(
+                (
+                    f"{get_slug(title)}.html",
+                    {
+                        "video_id": video_id,
+                        "video_format": self.video_format,
+                        "mimetype": self.main_rendition.mimetype,
+                        "audio_only": self.audio_only,
+                        "author": videos_channels[video_id],
+                        "title": title,
+                        "description": video["snippet"]["description"],
+                        "date": format_day(publication_date.date()),
+                        "subtitles": get_subtitles(video_id),
+                        "url": f"https://www.youtube.com/watch?v={video_id}",
+                        "channel_id": video["snippet"]["channelId"],
+                        "color": self.main_color,
+                        "background_color": self.secondary_color,
+                        "autoplay": self.autoplay,
+                    },
+                )
             )
-            with open(
-                self.build_dir.joinpath(f"{slug}.html"), "w", encoding="utf-8"
-            ) as fp:
-                fp.write(html)
+        logger.info(f"rendering {len(articles)} articles")
+        # tmp_dir (if set) is build_dir's parent
+        render_articles(
+            self.templates_dir,
+            self.build_dir,
+            articles,
+            workers=self.max_concurrency,
+            tmp_dir=self.build_dir.parent,
+        )
 
         # build homepage
         html = env.get_template("home.html").render(
             playlists=self.playlists,
             video_format=self.video_format,
+            audio_only=self.audio_only,
             title=self.title,
             description=self.description,
             color=self.main_color,
             background_color=self.secondary_color,
             page_label=_("Page {current}/{total}"),
             back_label=_("Back to top"),
+            search_label=_("Search"),
+            languages_label=_("All languages"),
+            load_error_label=_("Unable to load videos"),
         )
         with open(self.build_dir.joinpath("home.html"), "w", encoding="utf-8") as fp:
             fp.write(html)
@@ -887,60 +1733,177 @@ class Youtube2Zim(object):
         # rewrite app.js including `format`
         with open(self.assets_dir.joinpath("app.js"), "w", encoding="utf-8") as fp:
             fp.write(
-                env.get_template("assets/app.js").render(video_format=self.video_format)
+                env.get_template("assets/app.js").render(
+                    video_format=self.video_format,
+                    mimetype=self.main_rendition.mimetype,
+                )
             )
 
         # rewrite app.js including `pagination`
         with open(self.assets_dir.joinpath("db.js"), "w", encoding="utf-8") as fp:
             fp.write(
                 env.get_template("assets/db.js").render(
-                    NB_VIDEOS_PER_PAGE=self.nb_videos_per_page
+                    NB_VIDEOS_PER_PAGE=self.nb_videos_per_page,
+                    DATA_BLOCK_SIZE=DATA_BLOCK_SIZE,
                 )
             )
 
-        # write list of videos in data.js
-        def to_data_js(video):
-            return {
-                "id": video["contentDetails"]["videoId"],
-                "title": video["snippet"]["title"],
-                "slug": get_slug(video["snippet"]["title"]),
-                "description": video["snippet"]["description"],
-                "subtitles": get_subtitles(video["contentDetails"]["videoId"]),
-                "thumbnail": str(
-                    Path("videos").joinpath(
-                        video["contentDetails"]["videoId"], "video.webp"
+        # write videos data, loaded on demand by db.js: a table of videos
+        # shared by all playlists ([id, title, slug, description, [language
+        # index, ...]]) split in blocks in assets/data/videos_<n>.js and, in
+        # assets/data/playlist_<slug>.js, indexes of playlist's videos in that
+        # table and blocks they're in. Table is ordered by first playlist.
+        languages = []
+        languages_indexes = {}
+        data_videos = []
+        videos_indexes = {}
+        search_texts = []
+
+        def get_video_index(video):
+            video_id = video["contentDetails"]["videoId"]
+            if video_id not in videos_indexes:
+                subtitles = []
+                for subtitle in get_subtitles(video_id):
+                    if subtitle["code"] not in languages_indexes:
+                        languages_indexes[subtitle["code"]] = len(languages)
+                        languages.append(subtitle)
+                    subtitles.append(languages_indexes[subtitle["code"]])
+                description = video["snippet"]["description"]
+                if len(description) > LISTING_DESCRIPTION_LENGTH:
+                    listing_description = (
+                        description[:LISTING_DESCRIPTION_LENGTH] + "..."
                     )
-                ),
-            }
-
-        with open(self.assets_dir.joinpath("data.js"), "w", encoding="utf-8") as fp:
-            # write all playlists as they are
-            for playlist in self.playlists:
-                # retrieve list of videos for PL
-                playlist_videos = load_json(
-                    self.cache_dir, f"playlist_{playlist.playlist_id}_videos"
+                else:
+                    listing_description = description
+                search_texts.append(
+                    f"{video['snippet']['title']} {description}"
+                    if self.search_descriptions
+                    else video["snippet"]["title"]
                 )
-                # filtering-out missing ones (deleted or not downloaded)
-                playlist_videos = list(filter(skip_deleted_videos, playlist_videos))
-                playlist_videos = list(filter(is_present, playlist_videos))
-                playlist_videos = list(filter(has_channel, playlist_videos))
-                # sorting them based on playlist
-                playlist_videos.sort(key=lambda v: v["snippet"]["position"])
+                videos_indexes[video_id] = len(data_videos)
+                data_videos.append(
+                    [
+                        video_id,
+                        video["snippet"]["title"],
+                        get_slug(video["snippet"]["title"]),
+                        listing_description,
+                        subtitles,
+                    ]
+                )
+            return videos_indexes[video_id]
+
+        playlists_indexes = []
+        for playlist in self.playlists:
+            # retrieve list of videos for PL
+            playlist_videos = load_json(
+                self.cache_dir, f"playlist_{playlist.playlist_id}_videos"
+            )
+            # filtering-out missing ones (deleted or not downloaded)
+            playlist_videos = list(filter(skip_deleted_videos, playlist_videos))
+            playlist_videos = list(filter(is_present, playlist_videos))
+            playlist_videos = list(filter(has_channel, playlist_videos))
+            # sorting them based on playlist
+            playlist_videos.sort(key=lambda v: v["snippet"]["position"])
+            playlists_indexes.append(
+                (playlist.slug, list(map(get_video_index, playlist_videos)))
+            )
 
+        data_dir = self.assets_dir.joinpath("data")
+        shutil.rmtree(data_dir, ignore_errors=True)
+        data_dir.mkdir(parents=True)
+        for start in range(0, len(data_videos), DATA_BLOCK_SIZE):
+            with open(
+                data_dir.joinpath(f"videos_{start // DATA_BLOCK_SIZE}.js"),
+                "w",
+                encoding="utf-8",
+            ) as fp:
+                fp.write(
+                    f"videoDB.addVideos({start}, "
+                    f"{to_js_json(data_videos[start : start + DATA_BLOCK_SIZE])});\n"
+                )
+        for slug, indexes in playlists_indexes:
+            blocks = sorted({index // DATA_BLOCK_SIZE for index in indexes})
+            # subtitles languages facet: {code: [position in playlist, ...]}
+            facets = {}
+            for position, index in enumerate(indexes):
+                for language_index in data_videos[index][4]:
+                    facets.setdefault(languages[language_index]["code"], []).append(
+                        position
+                    )
+            with open(
+                data_dir.joinpath(f"playlist_{slug}.js"), "w", encoding="utf-8"
+            ) as fp:
                 fp.write(
-                    "var json_{slug} = {json_str};\n".format(
-                        slug=playlist.slug,
-                        json_str=json.dumps(
-                            list(map(to_data_js, playlist_videos)), indent=4
+                    f"videoDB.addPlaylist({to_js_json(slug)}, "
+                    f"{to_js_json(blocks)}, {to_js_json(indexes)}, "
+                    f"{to_js_json(facets)});\n"
+                )
+        # static listing pages, usable without JS
+        if self.static_listings:
+            playlists_by_slug = {playlist.slug: playlist for playlist in self.playlists}
+            template = env.get_template("playlist.html")
+            for slug, indexes in playlists_indexes:
+                # page 1 is written even for an empty playlist
+                nb_pages = max(1, math.ceil(len(indexes) / self.nb_videos_per_page))
+                for page in range(1, nb_pages + 1):
+                    start = (page - 1) * self.nb_videos_per_page
+                    html = template.render(
+                        playlist=playlists_by_slug[slug],
+                        playlists=self.playlists,
+                        videos=[
+                            {
+                                "id": data_videos[index][0],
+                                "title": data_videos[index][1],
+                                "slug": data_videos[index][2],
+                            }
+                            for index in indexes[
+                                start : start + self.nb_videos_per_page
+                            ]
+                        ],
+                        page=page,
+                        nb_pages=nb_pages,
+                        title=self.title,
+                        color=self.main_color,
+                        background_color=self.secondary_color,
+                        page_label=_("Page {current}/{total}").format(
+                            current=page, total=nb_pages
                         ),
+                        home_label=_("Home"),
                     )
+                    with open(
+                        self.build_dir.joinpath(f"playlist_{slug}_{page}.html"),
+                        "w",
+                        encoding="utf-8",
+                    ) as fp:
+                        fp.write(html)
+
+        # search index over titles (and descriptions), in shards by prefix
+        search_shards = build_search_index(search_texts)
+        for key, shard in search_shards.items():
+            with open(
+                data_dir.joinpath(f"search_{key}.js"), "w", encoding="utf-8"
+            ) as fp:
+                fp.write(
+                    f"videoSearch.addShard({to_js_json(key)}, {to_js_json(shard)});\n"
                 )
+        with open(self.assets_dir.joinpath("data.js"), "w", encoding="utf-8") as fp:
+            fp.write(f"var data_languages = {to_js_json(languages)};\n")
+            fp.write(f"var data_search_shards = {to_js_json(sorted(search_shards))};\n")
 
         # write a metadata.json file with some content-related data
         with open(
             self.build_dir.joinpath("metadata.json"), "w", encoding="utf-8"
         ) as fp:
-            json.dump({"video_format": self.video_format}, fp, indent=4)
+            json.dump(
+                {
+                    "video_format": self.video_format,
+                    "video_quality": self.video_quality,
+                    "audio_only": self.audio_only,
+                    "subtitles": self.subtitles_selection,
+                },
+                fp,
+                indent=4,
+            )
 
         # clean videos left out in videos directory
         remove_unused_videos(videos)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: ai ts=4 sts=4 et sw=4 nu
+
+"""
+    Build-time search index for the home page
+
+    Inverted index of videos (by their index in the videos table) per word,
+    sharded by words' prefix so the reader only loads the shards of the
+    words it searches for. Tokenization must match tokenize() in search.js
+"""
+
+import re
+import unicodedata
+
+SHARD_PREFIX_LENGTH = 2
+# whitespace, ASCII punctuation, Latin-1 symbols, general and CJK punctuation
+SEPARATORS = re.compile(r"[\s!-/:-@\[-`{-~\u00a0-\u00bf\u2000-\u206f\u3000-\u303f]+")
+COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+
+
+def tokenize(text):
+    """ lowercased, accents-stripped words of text """
+    text = COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text.lower()))
+    return [token for token in SEPARATORS.split(text) if token]
+
+
+def get_shard_key(token):
+    """ file-name safe key of token's shard: hex codes of its prefix """
+    return "".join(f"{ord(char):04x}" for char in token[:SHARD_PREFIX_LENGTH])
+
+
+def build_search_index(texts):
+    """{shard key: {token: [indexes]}} for a list of texts
+
+    indexes are those of texts containing token, delta-encoded"""
+
+    postings = {}
+    for index, text in enumerate(texts):
+        for token in set(tokenize(text)):
+            postings.setdefault(token, []).append(index)
+
+    shards = {}
+    for token in sorted(postings):
+        indexes = postings[token]
+        shards.setdefault(get_shard_key(token), {})[token] = [
+            index - previous for previous, index in zip([0] + indexes, indexes)
+        ]
+    return shards
@@ -1,21 +1,116 @@
 
 window.onload = genplaylist();
+setupSearch();
 
 function genplaylist() {
     // Load the initial data.
     // This will display all data without any language filter.
     videoDB.resetPage();
-    videoDB.getjson();
-    videoDB.loadData(undefined, function() {
+    videoDB.getjson(function(failed) {
+        if (failed) {
+            return showLoadError();
+        }
+        refreshLanguages();
+        showVideos();
+    });
+    return false;
+}
+
+function genlanguage() {
+    // Filter the selected playlist by subtitles language.
+    videoDB.resetPage();
+    showVideos(document.getElementById('language').value || undefined);
+    return false;
+}
+
+/**
+ * Reset the language filter with the
+ * subtitles languages of the selected playlist.
+ */
+function refreshLanguages() {
+    var select = document.getElementById('language');
+    while (select.options.length > 1) {
+        select.remove(1);
+    }
+    var languages = videoDB.getLanguages();
+    for (var i = 0; i < languages.length; i++) {
+        var option = document.createElement('option');
+        option.value = languages[i]['code'];
+        option.text = languages[i]['name'];
+        select.add(option);
+    }
+    select.selectedIndex = 0;
+    select.className = languages.length ? '' : 'hidden';
+}
+
+/**
+ * Replace the listing with an error message
+ * when its data files could not be loaded.
+ */
+function showLoadError() {
+    firstVideo(undefined);
+    refreshVideos([]);
+    document.getElementById('load-error').className = '';
+    var pageBoxes = document.getElementsByClassName('pagination');
+    for (var i = 0; i < pageBoxes.length; i++) {
+        pageBoxes[i].style.display = 'none';
+    }
+}
+
+/**
+ * Display the first page of the selected
+ * playlist or search results.
+ * @param {language} Optional subtitles language filter.
+ */
+function showVideos(language) {
+    document.getElementById('load-error').className = 'hidden';
+    videoDB.loadData(language, function() {
         var data = videoDB.getPage(videoDB.getPageNumber());
-        firstVideo(videoDB.getFirstVideo());
+        var first_video = videoDB.getFirstVideo();
+        firstVideo(first_video);
         refreshVideos(data);
-        videojs(document.querySelector('.video-js'));
-        trigger_webp_polyfill();
+        // listing thumbnails are polyfilled as they're shown
+        if (first_video) {
+            setup_player(document.querySelector('.video-js'), '{{ mimetype }}', function() {
+                trigger_webp_polyfill(document.getElementById('video-intro'));
+            });
+        }
     })
     setupPagination();
     refreshPagination();
-    return false;
+}
+
+/**
+ * Search as the user types, back to
+ * the selected playlist once cleared.
+ */
+function setupSearch() {
+    var input = document.getElementById('search');
+    var timer;
+    input.oninput = function() {
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            var query = input.value;
+            if (videoSearch.tokenize(query).length == 0) {
+                genplaylist();
+                return;
+            }
+            videoSearch.search(query, function(results) {
+                // query changed while searching
+                if (input.value != query) {
+                    return;
+                }
+                videoDB.resetPage();
+                videoDB.getResults(results, function(failed) {
+                    if (failed) {
+                        return showLoadError();
+                    }
+                    refreshLanguages();
+                    showVideos();
+                });
+            });
+        }, 250);
+    }
 }
 
 
@@ -91,17 +186,41 @@ function refreshPagination() {
     }
 }
 
+var CARDS_BATCH_SIZE = 12;  // cards added at once while scrolling
+var LAZY_MARGIN = 200;  // px from viewport to start loading
+var pendingCards = [];
+var cardsObserver;
+
 /**
- * Dynamically generate the video item out of
- * the passed in {pageData} parameter.
+ * Dynamically generate the video items out of
+ * the passed in {pageData} parameter, a batch at
+ * a time as the end of the list gets visible.
  * @param {pageData} Video data for the current page.
  */
 function refreshVideos(pageData) {
     var videoList = document.getElementById('video-items');
+    if (cardsObserver) {
+        cardsObserver.disconnect();
+    }
     videoList.innerHTML = '';
+    pendingCards = pageData.slice();
+    renderCards();
+}
+
+/**
+ * Add the next batch of video items to the list,
+ * with thumbnails loaded once visible.
+ */
+function renderCards() {
+    var videoList = document.getElementById('video-items');
+    var sentinel = document.getElementById('cards-sentinel');
+    if (sentinel) {
+        videoList.removeChild(sentinel);
+    }
 
-    for (i in pageData) {
-      var video = pageData[i];
+    var batch = pendingCards.splice(0, CARDS_BATCH_SIZE);
+    for (var i = 0; i < batch.length; i++) {
+      var video = batch[i];
       var li = document.createElement('li');
 
       var a = document.createElement('a')
@@ -109,7 +228,7 @@ function refreshVideos(pageData) {
       a.className = 'nostyle'
 
       var img = document.createElement('img');
-      img.src = ZIM_IMG_NS + "videos/" + video['id'] + "/video.webp";
+      img.setAttribute('data-src', ZIM_IMG_NS + "videos/" + video['id'] + "/video.webp");
 
       var title = document.createElement('p');
       title.id = 'title';
@@ -119,12 +238,76 @@ function refreshVideos(pageData) {
       a.appendChild(title);
       li.appendChild(a);
       videoList.appendChild(li);
+      observeLazy(img);
+    }
+
+    if (pendingCards.length > 0) {
+      sentinel = document.createElement('li');
+      sentinel.id = 'cards-sentinel';
+      videoList.appendChild(sentinel);
+      observeLazy(sentinel);
+    }
+    if (!cardsObserver) {
+      checkLazy();
+    }
+}
+
+/**
+ * Load a thumbnail or the next cards once {element}
+ * is close to the viewport.
+ */
+function showLazy(element) {
+    if (element.id == 'cards-sentinel') {
+        renderCards();
+        return;
+    }
+    element.src = element.getAttribute('data-src');
+    element.removeAttribute('data-src');
+    polyfill_webp_image(element);
+}
+
+function observeLazy(element) {
+    if (cardsObserver) {
+        cardsObserver.observe(element);
     }
 }
 
+/**
+ * Scroll-based fallback for browsers
+ * without IntersectionObserver.
+ */
+function checkLazy() {
+    var videoList = document.getElementById('video-items');
+    var elements = videoList.querySelectorAll('img[data-src], #cards-sentinel');
+    for (var i = 0; i < elements.length; i++) {
+        var rect = elements[i].getBoundingClientRect();
+        if (rect.top < window.innerHeight + LAZY_MARGIN && rect.bottom > -LAZY_MARGIN) {
+            showLazy(elements[i]);
+        }
+    }
+}
+
+if ('IntersectionObserver' in window) {
+    cardsObserver = new IntersectionObserver(function(entries) {
+        entries.forEach(function(entry) {
+            if (entry.isIntersecting) {
+                cardsObserver.unobserve(entry.target);
+                showLazy(entry.target);
+            }
+        });
+    }, {rootMargin: LAZY_MARGIN + 'px'});
+} else {
+    window.addEventListener('scroll', checkLazy);
+    window.addEventListener('resize', checkLazy);
+}
+
 
 function firstVideo(video) {
     var videoIntro = document.getElementById('video-intro');
+    if (!video) {
+        videoIntro.innerHTML = '';
+        return;
+    }
     var subtitles = '';
     if (video['subtitles'].length > 0) {
         for (i in video['subtitles']) {
@@ -132,19 +315,15 @@ function firstVideo(video) {
             subtitles += '<track kind="subtitles" src="' + ZIM_META_NS + 'videos/' + video['id'] + '/video.' + subtitle['code'] + '.vtt" srclang="' + subtitle['code'] + '" label="' + subtitle['name'] + '" />';
         }
     }
-    var video_desctiption = video['description'].slice(0, 200);
-    if (video['description'].length > 200) {
-        video_desctiption += '...';
-    }
     videoIntro.innerHTML = '' +
         '<video id="video_container" class="video-js vjs-default-skin" ' +
                'width="480px" height="270px" crossorigin ' +
-               'data-setup=\'{"techOrder": ["html5", "ogvjs"], ' +
+               'data-player=\'{"techOrder": ["html5", "ogvjs"], ' +
                             '"ogvjs": {"base": "assets/ogvjs"}, "autoplay": false, ' +
                                       '"preload": true, "controls": true, "controlBar": {"pictureInPictureToggle": false}}\'' +
                'poster="' + ZIM_IMG_NS + 'videos/' + video['id'] + '/video.webp">' +
             '<source src="' + ZIM_IMG_NS + 'videos/' + video['id'] + '/video.{{ video_format }}" ' +
-                    'type="video/{{ video_format }}" />' + subtitles + '</video>' +
+                    'type="{{ mimetype }}" />' + subtitles + '</video>' +
             '<div id="video-details">' +
                 '<h4 id="title">' +
                     '<a href=\'' + video['slug'] + '.html\'>' +
@@ -152,7 +331,7 @@ function firstVideo(video) {
                     '</a>' +
                 '</h4>' +
                 '<p class="description">' +
-                    video_desctiption +
+                    video['description'] +
                 '</p>' +
             '</div>';
 }
@@ -1,9 +1,11 @@
 /**
  * videoDB is responsible for loading
- * and managing the video data from the data.js file.
+ * and managing the video data from the files
+ * in assets/data, loaded on demand per playlist.
  */
 var videoDB = (function() {
   var ITEMS_PER_PAGE = {{ NB_VIDEOS_PER_PAGE }};
+  var BLOCK_SIZE = {{ DATA_BLOCK_SIZE }};
   var db = {};
   var data;
   var first_video;
@@ -11,11 +13,158 @@ var videoDB = (function() {
   var selected_playlist
   var  i
   var json_selected
+  var languages_selected
+  // videos table, filled by blocks (see addVideos)
+  var data_videos = [];
+  var loaded_blocks = {};
+  // {slug: {blocks: [...], videos: [...], languages: {...}}} of loaded playlists
+  var playlists = {};
+
+  /**
+   * Load data files by injecting script tags.
+   * @param {paths} Paths of the files in assets/data.
+   * @param {callback} Called once all files are loaded or
+   *                   failed to, with the paths of the failed ones.
+   */
+  db.loadScripts = function(paths, callback) {
+    var pending = paths.length;
+    var failed = [];
+    if (pending == 0) {
+      return callback(failed);
+    }
+    paths.forEach(function(path) {
+      var script = document.createElement('script');
+      script.src = ZIM_META_NS + 'assets/data/' + path;
+      script.onload = function() {
+        pending--;
+        if (pending == 0) {
+          callback(failed);
+        }
+      };
+      script.onerror = function() {
+        // removed so that a later call tries again
+        document.body.removeChild(script);
+        failed.push(path);
+        script.onload();
+      };
+      document.body.appendChild(script);
+    });
+  }
+
+  /**
+   * Load the blocks of the videos table not loaded yet.
+   * @param {blocks} Numbers of the blocks.
+   * @param {callback} Called once all blocks are loaded or failed
+   *                   to, with the paths of the failed ones.
+   */
+  function loadBlocks(blocks, callback) {
+    var missing = blocks.filter(function(block) {
+      return !loaded_blocks[block];
+    });
+    db.loadScripts(missing.map(function(block) {
+      return 'videos_' + block + '.js';
+    }), function(failed) {
+      missing.forEach(function(block) {
+        if (failed.indexOf('videos_' + block + '.js') == -1) {
+          loaded_blocks[block] = true;
+        }
+      });
+      callback(failed);
+    });
+  }
+
+  /**
+   * Called by videos_<n>.js files with a block
+   * of the videos table.
+   * @param {start} Index of the first video of the block.
+   * @param {videos} Videos of the block.
+   */
+  db.addVideos = function(start, videos) {
+    for (var j = 0; j < videos.length; j++) {
+      data_videos[start + j] = videos[j];
+    }
+  }
+
+  /**
+   * Called by playlist_<slug>.js files.
+   * @param {slug} Slug of the playlist.
+   * @param {blocks} Blocks of the videos table it needs.
+   * @param {videos} Indexes of its videos in the videos table.
+   * @param {languages} Positions in videos of those with
+   *                    subtitles, per language code.
+   */
+  db.addPlaylist = function(slug, blocks, videos, languages) {
+    playlists[slug] = {'blocks': blocks, 'videos': videos, 'languages': languages};
+  }
+
+  /**
+   * Load the selected playlist and the blocks
+   * of videos it needs, if not already loaded.
+   * @param {callback} This callback will be called
+   *                   once the playlist is loaded and
+   *                   still the selected one, with
+   *                   whether some data failed to load.
+   */
+  db.getjson = function(callback){
+    i = document.playlist.list.selectedIndex;
+    var slug = document.playlist.list.options[i].value;
+    selected_playlist = slug;
+
+    function onLoaded(failed) {
+      // selection changed while loading
+      if (slug != selected_playlist) {
+        return;
+      }
+      if (failed.length) {
+        return callback(true);
+      }
+      json_selected = playlists[slug]['videos'];
+      languages_selected = playlists[slug]['languages'];
+      callback(false);
+    }
+
+    function onPlaylistLoaded(failed) {
+      if (!playlists[slug]) {
+        return onLoaded(failed);
+      }
+      loadBlocks(playlists[slug]['blocks'], onLoaded);
+    }
+
+    if (playlists[slug]) {
+      onPlaylistLoaded([]);
+    } else {
+      db.loadScripts(['playlist_' + slug + '.js'], onPlaylistLoaded);
+    }
+  }
+
+  /**
+   * Select search results instead of a playlist,
+   * loading the blocks of videos they need.
+   * @param {indexes} Indexes of the videos in the videos table.
+   * @param {callback} Called once the videos are loaded, with
+   *                   whether some of them failed to load.
+   */
+  db.getResults = function(indexes, callback) {
+    selected_playlist = undefined;
+    var blocks = {};
+    indexes.forEach(function(index) {
+      blocks[Math.floor(index / BLOCK_SIZE)] = true;
+    });
+    loadBlocks(Object.keys(blocks), function(failed) {
+      if (failed.length) {
+        return callback(true);
+      }
+      json_selected = indexes;
+      languages_selected = {};
+      callback(false);
+    });
+  }
+
   /**
    * Load the data with or without an 
    * applied language filter. 
-   * The data will be loaded from the json in 
-   * the data.js file.
+   * The data will be loaded from the 
+   * selected playlist (see getjson).
    * @param {language} Language filter that you want
    *                   to apply to the data set. 
    *                   Pass in 'undefined' if you don't 
@@ -23,34 +172,55 @@ var videoDB = (function() {
    * @param {callback} This callback will be called 
    *                   when the data is loaded.
    */
-  db.getjson = function(){
-	i = document.playlist.list.selectedIndex;
-	selected_playlist = document.playlist.list.options[i].value;
-	json_selected = window["json_".concat(selected_playlist)];
-  }
   db.loadData = function(language, callback){
+    // data holds indexes in data_videos (see getVideo)
     if (typeof language === 'undefined'){
-      data = json_selected;
-      first_video = data.shift();
+      data = json_selected.slice(1);
+      first_video = json_selected[0];
     }
     else {
-
-      // Clear the previously loaded data.
-      data = [];
-
-      // Iterate through the whole data set and 
-      // add the video objects that have the language 
-      // that we want to the data array.
-      for (i in json_selected){
-        if (json_selected[i].languages.indexOf(language) > -1) {
-          data.push(json_selected[i]);
-        }
-      }
+      // videos with subtitles in that language,
+      // from the selected playlist's facet
+      data = (languages_selected[language] || []).map(function(position) {
+        return json_selected[position];
+      });
       first_video = data.shift();
     }
     callback();
   }
 
+  /**
+   * Get a video object from its index in the
+   * videos table shared by all playlists.
+   * @param {index} Index of the video in data_videos.
+   */
+  db.getVideo = function(index) {
+    var video = data_videos[index];
+    var subtitles = [];
+    for (var j = 0; j < video[4].length; j++) {
+      subtitles.push(data_languages[video[4][j]]);
+    }
+    return {
+      'id': video[0],
+      'title': video[1],
+      'slug': video[2],
+      'description': video[3],
+      'subtitles': subtitles
+    };
+  }
+
+  /**
+   * Get the subtitles languages of the selected
+   * playlist, sorted by name.
+   */
+  db.getLanguages = function() {
+    return data_languages.filter(function(language) {
+      return language.code in languages_selected;
+    }).sort(function(a, b) {
+      return a.name.localeCompare(b.name);
+    });
+  }
+
   /**
    * Get the count pages that we need to set up.
    */
@@ -111,11 +281,14 @@ var videoDB = (function() {
   db.getPage = function(page) {
     var pageStart = (page-1)*ITEMS_PER_PAGE;
     var pageEnd = page*ITEMS_PER_PAGE;
-    return data.slice(pageStart, pageEnd);
+    return data.slice(pageStart, pageEnd).map(db.getVideo);
   }
 
   db.getFirstVideo = function() {
-    return first_video;
+    if (typeof first_video === 'undefined') {
+      return undefined;
+    }
+    return db.getVideo(first_video);
   }
 
   return db;
@@ -0,0 +1,69 @@
+/* Loading of heavy assets only once feature detection shows they're needed:
+   ogv.js for browsers not playing the video format natively and webp-hero
+   (see webp-trigger.js) for those without WebP support */
+
+// {key: callbacks} of assets being loaded, {key: true} once loaded
+var loading_assets = {};
+var loaded_assets = {};
+
+/* load scripts one after the other then call callback */
+load_scripts = function (paths, callback) {
+    if (paths.length == 0) {
+        return callback();
+    }
+    var script = document.createElement('script');
+    script.src = ZIM_META_NS + paths[0];
+    script.onload = function () {
+        load_scripts(paths.slice(1), callback);
+    };
+    document.body.appendChild(script);
+}
+
+/* load scripts under key only once, whatever the number of calls */
+load_once = function (key, paths, callback) {
+    if (loaded_assets[key]) {
+        return callback();
+    }
+    if (loading_assets[key]) {
+        loading_assets[key].push(callback);
+        return;
+    }
+    loading_assets[key] = [callback];
+    load_scripts(paths, function () {
+        loaded_assets[key] = true;
+        var callbacks = loading_assets[key];
+        delete loading_assets[key];
+        for (var i = 0; i < callbacks.length; i++) {
+            callbacks[i]();
+        }
+    });
+}
+
+/* whether browser can't play mimetype natively */
+needs_ogvjs = function (mimetype) {
+    var video = document.createElement('video');
+    return !video.canPlayType || video.canPlayType(mimetype) === '';
+}
+
+/* load video.js (and ogv.js if needed to play mimetype) */
+load_player = function (mimetype, callback) {
+    var paths = ['assets/videojs/video.min.js'];
+    if (needs_ogvjs(mimetype)) {
+        paths.push('assets/ogvjs/ogv-support.js', 'assets/ogvjs/ogv.js', 'assets/videojs-ogvjs.js');
+    }
+    load_once('player', paths, callback);
+}
+
+/* start video.js on element with options from its data-player attribute */
+setup_player = function (element, mimetype, callback) {
+    load_player(mimetype, function () {
+        // element replaced while loading (home)
+        if (!document.body.contains(element)) {
+            return;
+        }
+        videojs(element, JSON.parse(element.getAttribute('data-player')));
+        if (callback) {
+            callback();
+        }
+    });
+}
@@ -0,0 +1,140 @@
+/**
+ * videoSearch answers searches on videos titles
+ * (and descriptions) using the index built by the scraper:
+ * assets/data/search_<key>.js files, one per words' prefix,
+ * loaded on demand.
+ */
+var videoSearch = (function() {
+  var PREFIX_LENGTH = 2;
+  // must match youtube2zim/search.py
+  var SEPARATORS = /[\s!-\/:-@\[-`{-~\u00a0-\u00bf\u2000-\u206f\u3000-\u303f]+/;
+  var COMBINING_MARKS = /[\u0300-\u036f]/g;
+  var search = {};
+  // {key: {word: [video index, ...]}} of loaded shards
+  var shards = {};
+
+  /**
+   * Get the normalized words of a text.
+   * @param {text} Text to split into words.
+   */
+  search.tokenize = function(text) {
+    text = text.toLowerCase();
+    if (text.normalize) {
+      text = text.normalize('NFKD').replace(COMBINING_MARKS, '');
+    }
+    return text.split(SEPARATORS).filter(function(token) {
+      return token.length > 0;
+    });
+  }
+
+  function getShardKey(token) {
+    var key = '';
+    for (var j = 0; j < Math.min(token.length, PREFIX_LENGTH); j++) {
+      key += ('000' + token.charCodeAt(j).toString(16)).slice(-4);
+    }
+    return key;
+  }
+
+  /**
+   * Get the keys of existing shards which may have
+   * words starting with token: all shards of its
+   * first letter if shorter than the shards prefix.
+   * @param {token} Normalized word or word prefix.
+   */
+  function getShardKeys(token) {
+    var key = getShardKey(token);
+    return data_search_shards.filter(function(shard_key) {
+      if (token.length < PREFIX_LENGTH) {
+        return shard_key.indexOf(key) === 0;
+      }
+      return shard_key == key;
+    });
+  }
+
+  /**
+   * Called by search_<key>.js files.
+   * @param {key} Key of the shard.
+   * @param {index} Delta-encoded video indexes per word.
+   */
+  search.addShard = function(key, index) {
+    for (var word in index) {
+      var indexes = index[word];
+      for (var j = 1; j < indexes.length; j++) {
+        indexes[j] += indexes[j - 1];
+      }
+    }
+    shards[key] = index;
+  }
+
+  /**
+   * Get the sorted indexes of videos with
+   * a word starting with token.
+   * @param {token} Normalized word or word prefix.
+   */
+  function lookup(token) {
+    var found = {};
+    getShardKeys(token).forEach(function(key) {
+      var shard = shards[key];
+      for (var word in shard) {
+        if (word.indexOf(token) === 0) {
+          shard[word].forEach(function(index) {
+            found[index] = true;
+          });
+        }
+      }
+    });
+    return Object.keys(found).map(Number).sort(function(a, b) {
+      return a - b;
+    });
+  }
+
+  function intersect(first, second) {
+    var result = [];
+    var j = 0;
+    var k = 0;
+    while (j < first.length && k < second.length) {
+      if (first[j] < second[k]) {
+        j++;
+      } else if (first[j] > second[k]) {
+        k++;
+      } else {
+        result.push(first[j]);
+        j++;
+        k++;
+      }
+    }
+    return result;
+  }
+
+  /**
+   * Search videos having, for each word of the query,
+   * a word starting with it (so it works while typing).
+   * @param {query} Text entered by the user.
+   * @param {callback} Called with the sorted indexes
+   *                   of matching videos in the videos table.
+   */
+  search.search = function(query, callback) {
+    var tokens = search.tokenize(query);
+    var keys = {};
+    tokens.forEach(function(token) {
+      getShardKeys(token).forEach(function(key) {
+        keys[key] = true;
+      });
+    });
+    var missing = Object.keys(keys).filter(function(key) {
+      return !shards[key];
+    });
+    videoDB.loadScripts(missing.map(function(key) {
+      return 'search_' + key + '.js';
+    }), function() {
+      var results = tokens.length ? lookup(tokens[0]) : [];
+      for (var j = 1; j < tokens.length; j++) {
+        results = intersect(results, lookup(tokens[j]));
+      }
+      callback(results);
+    });
+  }
+
+  return search;
+
+}());
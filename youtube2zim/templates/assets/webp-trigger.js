@@ -1,14 +1,79 @@
-trigger_webp_polyfill = function () {
-    webpHero.detectWebpSupport().then(function (support_webp){
+// detected once, shared by all polyfilling calls. null while unknown
+var webp_support = null;
+var webp_support_callbacks = [];
+var webp_machine;
+
+/* call callback with whether browser displays WebP natively */
+detect_webp_support = function (callback) {
+    if (webp_support !== null) {
+        return callback(webp_support);
+    }
+    webp_support_callbacks.push(callback);
+    if (webp_support_callbacks.length > 1) {
+        return;
+    }
+    var image = new Image();
+    var done = function (support) {
+        webp_support = support;
+        for (var i = 0; i < webp_support_callbacks.length; i++) {
+            webp_support_callbacks[i](support);
+        }
+        webp_support_callbacks = [];
+    };
+    image.onload = function () { done(image.width > 0 && image.height > 0); };
+    image.onerror = function () { done(false); };
+    // 1x1 lossless WebP
+    image.src = "data:image/webp;base64,UklGRhoAAABXRUJQVlA4TA0AAAAvAAAAEAcQERGIiP4HAA==";
+}
+
+/* call callback with a webp-hero machine, loading it on first use */
+get_webp_machine = function (callback) {
+    load_once("webp", ["assets/polyfills.js", "assets/webp-hero.bundle.js"], function () {
+        if (!webp_machine) {
+            webp_machine = new webpHero.WebpMachine();
+        }
+        callback(webp_machine);
+    });
+}
+
+/* polyfill images of the document (or of container only) */
+trigger_webp_polyfill = function (container) {
+    detect_webp_support(function (support_webp){
         if (!support_webp) {
             console.log("no WebP support, polyfilling.");
+            var i;
             // un-hide ogvjs-poster so the polyfill can transform it
-            $(".ogvjs-poster").css("visibility", "");
+            var posters = document.getElementsByClassName("ogvjs-poster");
+            for (i = 0; i < posters.length; i++) {
+                posters[i].style.visibility = "";
+            }
             // hide video-js poster (which uses background-image)
-            $(".vjs-poster").css("display", "none");
+            posters = document.getElementsByClassName("vjs-poster");
+            for (i = 0; i < posters.length; i++) {
+                posters[i].style.display = "none";
+            }
+
+            get_webp_machine(function (machine) {
+                if (container) {
+                    var images = container.getElementsByTagName("img");
+                    for (var j = 0; j < images.length; j++) {
+                        machine.polyfillImage(images[j]);
+                    }
+                } else {
+                    machine.polyfillDocument();
+                }
+            });
+        }
+    });
+}
 
-            let webpMachine = new webpHero.WebpMachine();
-            webpMachine.polyfillDocument();
+/* polyfill a single image, once it's being shown */
+polyfill_webp_image = function (image) {
+    detect_webp_support(function (support_webp){
+        if (!support_webp) {
+            get_webp_machine(function (machine) {
+                machine.polyfillImage(image);
+            });
         }
     });
 }
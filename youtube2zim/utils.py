@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 # vim: ai ts=4 sts=4 et sw=4 nu
 
+import os
 import json
+import shutil
 
 from slugify import slugify
 
@@ -40,3 +42,30 @@ def load_json(cache_dir, key):
 def has_argument(arg_name, all_args):
     """ whether --arg_name is specified in all_args """
     return list(filter(lambda x: x.startswith(f"--{arg_name}"), all_args))
+
+
+def get_argument_value(arg_name, all_args):
+    """ value of --arg_name in all_args (as `--arg value` or `--arg=value`) or None """
+    for index, arg in enumerate(all_args):
+        if arg == f"--{arg_name}" and index + 1 < len(all_args):
+            return all_args[index + 1]
+        if arg.startswith(f"--{arg_name}="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def link_or_copy(src, dst):
+    """ hardlink src to dst, falling back to a copy (across filesystems) """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def to_js_json(data):
+    """ compact JSON for a JS file, keeping non-ASCII text unescaped """
+    return (
+        json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        .replace("\u2028", "\\u2028")
+        .replace("\u2029", "\\u2029")
+    )
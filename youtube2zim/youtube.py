@@ -2,7 +2,8 @@
 # -*- coding: utf-8 -*-
 # vim: ai ts=4 sts=4 et sw=4 nu
 
-import requests
+import re
+
 from dateutil import parser as dt_parser
 from zimscraperlib.download import save_file
 from zimscraperlib.image.transformation import resize_image
@@ -20,6 +21,8 @@ SEARCH_API = f"{YOUTUBE_API}/search"
 VIDEOS_API = f"{YOUTUBE_API}/videos"
 MAX_VIDEOS_PER_REQUEST = 50  # for VIDEOS_API
 RESULTS_PER_PAGE = 50  # max: 50
+# quota cost (units) of API requests. others cost 1
+QUOTA_COSTS = {SEARCH_API: 100}
 
 
 class Playlist(object):
@@ -53,18 +56,47 @@ class Playlist(object):
         }
 
 
+def api_get(url, params):
+    """ GET request to Youtube API via shared session, accounting quota usage """
+    YOUTUBE.add_quota(QUOTA_COSTS.get(url, 1))
+    return YOUTUBE.session.get(url, params=params)
+
+
 def credentials_ok():
     """ check that a Youtube search is successful, validating API_KEY """
-    req = requests.get(
+    # already validated by this process
+    if YOUTUBE.api_key in YOUTUBE.valid_api_keys:
+        return True
+    req = api_get(
         SEARCH_API, params={"part": "snippet", "maxResults": 1, "key": YOUTUBE.api_key}
     )
     if req.status_code > 400:
         logger.error(f"HTTP {req.status_code} Error response: {req.text}")
     try:
         req.raise_for_status()
-        return bool(req.json()["items"])
+        if not req.json()["items"]:
+            return False
     except Exception:
         return False
+    YOUTUBE.valid_api_keys.add(YOUTUBE.api_key)
+    return True
+
+
+def load_api_cache(folder):
+    """{key: result} of API results saved in folder (an --api-cache)
+
+    Read once per process: long-lived workers running several scrapers
+    from the same cache only stat its files again"""
+    paths = sorted(folder.glob("*.json"))
+    signature = [(path.name, path.stat().st_mtime_ns) for path in paths]
+    cached = YOUTUBE.api_caches.get(str(folder))
+    if not cached or cached[0] != signature:
+        cached = (
+            signature,
+            {path.stem: load_json(folder, path.stem) for path in paths},
+        )
+        YOUTUBE.api_caches[str(folder)] = cached
+    return cached[1]
 
 
 def get_channel_json(channel_id, for_username=False):
@@ -73,7 +105,7 @@ def get_channel_json(channel_id, for_username=False):
     channel_json = load_json(YOUTUBE.cache_dir, fname)
     if channel_json is None:
         logger.debug(f"query youtube-api for Channel #{channel_id}")
-        req = requests.get(
+        req = api_get(
             CHANNELS_API,
             params={
                 "forUsername" if for_username else "id": channel_id,
@@ -110,7 +142,7 @@ def get_channel_playlists_json(channel_id):
     items = []
     page_token = None
     while True:
-        req = requests.get(
+        req = api_get(
             PLAYLIST_API,
             params={
                 "channelId": channel_id,
@@ -138,7 +170,7 @@ def get_playlist_json(playlist_id):
     playlist_json = load_json(YOUTUBE.cache_dir, fname)
     if playlist_json is None:
         logger.debug(f"query youtube-api for Playlist #{playlist_id}")
-        req = requests.get(
+        req = api_get(
             PLAYLIST_API,
             params={"id": playlist_id, "part": "snippet", "key": YOUTUBE.api_key},
         )
@@ -170,7 +202,7 @@ def get_videos_json(playlist_id):
     items = []
     page_token = None
     while True:
-        req = requests.get(
+        req = api_get(
             PLAYLIST_ITEMS_API,
             params={
                 "playlistId": playlist_id,
@@ -212,7 +244,7 @@ def get_videos_authors_info(videos_ids):
         req_items = {}
         page_token = None
         while True:
-            req = requests.get(
+            req = api_get(
                 VIDEOS_API,
                 params={
                     "id": ",".join(videos_ids),
@@ -252,6 +284,48 @@ def get_videos_authors_info(videos_ids):
     return items
 
 
+def parse_duration(duration):
+    """ seconds from an ISO 8601 duration (`PT1H2M3S`) as returned by API """
+    match = re.match(
+        r"^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$", duration or ""
+    )
+    if not match:
+        return 0
+    days, hours, minutes, seconds = [int(value or 0) for value in match.groups()]
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def get_videos_durations(videos_ids):
+    """ {videoId: duration in seconds} for all videos_ids """
+
+    items = load_json(YOUTUBE.cache_dir, "videos_durations")
+    if items is not None:
+        return items
+
+    logger.debug(f"query youtube-api for durations of {len(videos_ids)} videos")
+
+    items = {}
+    for interv in range(0, len(videos_ids), MAX_VIDEOS_PER_REQUEST):
+        req = api_get(
+            VIDEOS_API,
+            params={
+                "id": ",".join(videos_ids[interv : interv + MAX_VIDEOS_PER_REQUEST]),
+                "part": "contentDetails",
+                "key": YOUTUBE.api_key,
+                "maxResults": RESULTS_PER_PAGE,
+            },
+        )
+        if req.status_code > 400:
+            logger.error(f"HTTP {req.status_code} Error response: {req.text}")
+        req.raise_for_status()
+        for item in req.json()["items"]:
+            items[item["id"]] = parse_duration(item["contentDetails"].get("duration"))
+
+    save_json(YOUTUBE.cache_dir, "videos_durations", items)
+
+    return items
+
+
 def save_channel_branding(channels_dir, channel_id, save_banner=False):
     """ download, save and resize profile [and banner] of a channel """
     channel_json = get_channel_json(channel_id)